@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+"""Gestor de conexiones SQLite compartido por login y storage"""
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+
+import config
+
+# Directorio de datos local
+DATA_DIR = Path(__file__).resolve().parent.parent / "db"
+DATA_DIR.mkdir(exist_ok=True)
+
+# Archivo de base de datos SQLite
+DB_FILE = DATA_DIR / "keypass.db"
+
+# Pragmas aplicados a cada conexión nueva
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-8000",
+    "PRAGMA mmap_size=67108864",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+
+# Conexiones de lectura: un pool pequeño compartido por todos los hilos.
+# No se usa threading.local: PyQt crea y destruye el estado de hilo de Python en
+# cada QRunnable.run, así que una conexión por hilo se perdería tras cada tarea.
+_pool_lock = threading.Lock()
+_idle = []            # conexiones libres, listas para reutilizar
+_open_conns = set()   # todas las abiertas del pool (para close_all)
+
+
+def _open() -> sqlite3.Connection:
+    """Abre una conexión nueva y aplica los pragmas"""
+    # Cada conexión la usa un solo hilo a la vez, pero puede cambiar de hilo entre usos
+    conn = sqlite3.connect(DB_FILE, check_same_thread=False)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def get_connection() -> sqlite3.Connection:
+    """
+    Toma una conexión del pool (o abre una si no hay libres).
+    Hay que devolverla siempre con release_connection().
+    """
+    with _pool_lock:
+        if _idle:
+            return _idle.pop()
+    conn = _open()
+    with _pool_lock:
+        _open_conns.add(conn)
+    return conn
+
+
+def get_setting(key: str) -> str | None:
+    """Valor de la tabla settings, o None si no está"""
+    conn = get_connection()
+    try:
+        row = conn.execute("SELECT value FROM settings WHERE key=?", (key,)).fetchone()
+        return row[0] if row else None
+    finally:
+        release_connection(conn)
+
+
+def _put_setting(conn: sqlite3.Connection, key: str, value: str) -> None:
+    conn.execute("INSERT INTO settings(key, value) VALUES (?, ?) "
+                 "ON CONFLICT(key) DO UPDATE SET value=excluded.value", (key, value))
+
+
+def set_setting(key: str, value: str) -> None:
+    """Guarda un ajuste (a través del hilo escritor)"""
+    run_write(_put_setting, key, value)
+
+
+def _close_quietly(conn: sqlite3.Connection) -> None:
+    try:
+        conn.close()
+    except sqlite3.Error:
+        pass
+
+
+def release_connection(conn: sqlite3.Connection) -> None:
+    """Devuelve la conexión al pool; deshace cualquier transacción sin confirmar"""
+    try:
+        if conn.in_transaction:
+            conn.rollback()
+    except sqlite3.Error:
+        pass
+    with _pool_lock:
+        if conn not in _open_conns:
+            # Cerrada por close_all() mientras estaba en uso
+            return
+        if len(_idle) < config.DB_POOL_SIZE:
+            if conn not in _idle:
+                _idle.append(conn)
+            return
+        _open_conns.discard(conn)
+    _close_quietly(conn)
+
+
+# ================== Escritor único ==================
+# Todas las escrituras pasan por un hilo con su propia conexión: las operaciones
+# se encolan y las que llegan juntas se confirman en una sola transacción.
+_write_queue = queue.Queue()
+_writer_lock = threading.Lock()
+_writer = None        # hilo escritor (se arranca con la primera escritura)
+_writer_conn = None   # su conexión (modo autocommit: las transacciones las abre él)
+_STOP = object()
+
+
+def _writer_loop(conn: sqlite3.Connection) -> None:
+    try:
+        while True:
+            op = _write_queue.get()
+            if op is _STOP:
+                break
+            batch = [op]
+            stop = False
+            # Agrupar lo que ya esté en cola (group commit)
+            while len(batch) < config.DB_WRITE_BATCH:
+                try:
+                    op = _write_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if op is _STOP:
+                    stop = True
+                    break
+                batch.append(op)
+            try:
+                _run_batch(conn, batch)
+            except BaseException as e:
+                # Nunca dejar a nadie esperando: falla lo que quede del lote y sigue
+                _fail_pending(batch, e)
+                _rollback_quietly(conn)
+            if stop:
+                break
+    finally:
+        conn.close()
+
+
+def _fail_pending(batch: list, error: BaseException) -> None:
+    """Resuelve con 'error' los futures del lote que aún no tienen resultado"""
+    for _fn, _args, future in batch:
+        if future.done():
+            continue
+        if not future.running() and not future.set_running_or_notify_cancel():
+            continue
+        future.set_exception(error)
+
+
+def _rollback_quietly(conn: sqlite3.Connection) -> None:
+    if conn.in_transaction:
+        try:
+            conn.execute("ROLLBACK")
+        except sqlite3.Error:
+            pass
+
+
+def _run_batch(conn: sqlite3.Connection, batch: list) -> None:
+    """
+    Ejecuta un lote en una transacción. Cada operación va en su SAVEPOINT: si falla
+    solo se deshace ella. Los futures se resuelven después del COMMIT.
+    Si SQLite aborta la transacción entera (disco lleno, E/S...), falla todo el lote.
+    """
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+    except sqlite3.Error as e:
+        _fail_pending(batch, e)
+        return
+
+    outcomes = []
+    for fn, args, future in batch:
+        if not future.set_running_or_notify_cancel():
+            continue
+        try:
+            conn.execute("SAVEPOINT write_op")
+            result = fn(conn, *args)
+        except Exception as e:
+            if not conn.in_transaction:
+                # SQLite ya deshizo la transacción: se pierde todo el lote
+                future.set_exception(e)
+                _fail_pending(batch, e)
+                return
+            try:
+                conn.execute("ROLLBACK TO write_op")
+                conn.execute("RELEASE write_op")
+            except sqlite3.Error as rollback_error:
+                future.set_exception(e)
+                _fail_pending(batch, rollback_error)
+                _rollback_quietly(conn)
+                return
+            outcomes.append((future, False, e))
+        else:
+            conn.execute("RELEASE write_op")
+            outcomes.append((future, True, result))
+
+    try:
+        conn.execute("COMMIT")
+    except sqlite3.Error as e:
+        _rollback_quietly(conn)
+        for future, ok, value in outcomes:
+            future.set_exception(e if ok else value)
+        return
+
+    for future, ok, value in outcomes:
+        if ok:
+            future.set_result(value)
+        else:
+            future.set_exception(value)
+
+
+def _ensure_writer() -> None:
+    global _writer, _writer_conn
+    with _writer_lock:
+        if _writer is not None and _writer.is_alive():
+            return
+        conn = _open()
+        conn.isolation_level = None
+        _writer_conn = conn
+        _writer = threading.Thread(target=_writer_loop, args=(conn,), name="keypass-db-writer", daemon=True)
+        _writer.start()
+
+
+def submit_write(fn, *args) -> Future:
+    """
+    Encola fn(conn, *args) para el hilo escritor y devuelve un Future con su resultado.
+    fn no debe hacer commit ni rollback: el escritor confirma el lote entero.
+    """
+    future = Future()
+    if threading.current_thread() is _writer:
+        # Escritura anidada desde otra operación: se ejecuta dentro del mismo lote
+        try:
+            future.set_result(fn(_writer_conn, *args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    _ensure_writer()
+    _write_queue.put((fn, args, future))
+    return future
+
+
+def run_write(fn, *args):
+    """Como submit_write() pero espera a que el lote se confirme; propaga la excepción de fn"""
+    return submit_write(fn, *args).result()
+
+
+def _stop_writer() -> None:
+    global _writer, _writer_conn
+    with _writer_lock:
+        writer = _writer
+        _writer = None
+        _writer_conn = None
+    if writer is not None and writer.is_alive():
+        _write_queue.put(_STOP)
+        writer.join(timeout=10)
+
+
+def close_all() -> None:
+    """Cierra todas las conexiones abiertas (al salir de la aplicación)"""
+    # Primero vaciar la cola de escrituras pendientes
+    _stop_writer()
+    with _pool_lock:
+        conns = list(_open_conns)
+        _open_conns.clear()
+        _idle.clear()
+    for conn in conns:
+        _close_quietly(conn)
@@ -1,55 +1,175 @@
 # -*- coding: utf-8 -*-
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.primitives import hashes, hmac
 from cryptography.hazmat.backends import default_backend
+from cryptography.exceptions import InvalidTag
+from concurrent.futures import ThreadPoolExecutor
 import keyring
+import keyring.errors
 import getpass
+import threading
+import time
 import os
 import base64
+import config
+from Logic.db import get_connection, release_connection, run_write
+
+# Versiones del formato de registro
+RECORD_V1 = 1  # IV(16) + HMAC(32) + AES-CBC (sin byte de versión)
+RECORD_V2 = 2  # 0x02 + nonce(12) + AES-GCM (ciphertext + tag(16))
+RECORD_PREVIOUS_KEY = 0  # descifrado con la clave anterior (rotación en curso)
+_V2_HEADER = bytes([RECORD_V2])
+_V2_OVERHEAD = 1 + 12 + 16
 
 class AESEncryption:
     """
-    Clase para manejar cifrado AES-CBC con HMAC-SHA256
-    Formato: IV(16) + HMAC(32) + Ciphertext(variable)
+    Clase para manejar el cifrado de registros.
+    v2 (por defecto): 0x02 + Nonce(12) + AES-GCM(Ciphertext + Tag(16)), con subclave HKDF
+    v1 (lectura):     IV(16) + HMAC(32) + AES-CBC Ciphertext(variable)
     """
-    def __init__(self, key: bytes):
+    def __init__(self, key: bytes, version: int | None = None, previous: "AESEncryption | None" = None):
         self.key = key
         self.backend = default_backend()
+        self.version = version or config.RECORD_FORMAT_VERSION
+        # Durante una rotación de clave: cifrador de la clave antigua para leer lo no migrado
+        self.previous = previous
+        # Primitivas reutilizables: el algoritmo y una plantilla HMAC que se copia en cada uso
+        self._algorithm = algorithms.AES(key)
+        self._hmac = hmac.HMAC(key, hashes.SHA256(), backend=self.backend)
+        # v2 usa una subclave propia para no compartir clave entre AES-GCM y CBC/HMAC
+        v2_key = HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=b"KeyPass record v2").derive(key)
+        self._aead = AESGCM(v2_key)
+        # Huella de la clave (se guarda en la base de datos; no permite recuperarla)
+        self.key_id = key_fingerprint(key)
     
     def encrypt(self, plaintext: bytes) -> bytes:
-        """Cifra datos usando AES-CBC + HMAC-SHA256"""
-        iv = os.urandom(16)
-        cipher = Cipher(algorithms.AES(self.key), modes.CBC(iv), backend=self.backend)
-        encryptor = cipher.encryptor()
-        plaintext_padded = self._pad_pkcs7(plaintext)
-        ciphertext = encryptor.update(plaintext_padded) + encryptor.finalize()
-        
-        h = hmac.HMAC(self.key, hashes.SHA256(), backend=self.backend)
-        h.update(iv + ciphertext)
-        mac = h.finalize()
-        
-        return iv + mac + ciphertext
+        """Cifra datos con el formato configurado (v2: AES-GCM)"""
+        if self.version == RECORD_V1:
+            return self._encrypt(plaintext, os.urandom(16))
+        return self._encrypt_v2(plaintext, os.urandom(12))
     
     def decrypt(self, ciphertext: bytes) -> bytes:
+        """Descifra un registro v2 o v1"""
+        return self.decrypt_versioned(ciphertext)[0]
+
+    def decrypt_versioned(self, ciphertext: bytes) -> tuple[bytes, int]:
+        """
+        Descifra y devuelve (plaintext, versión del registro).
+        Si solo la clave anterior lo descifra, la versión es RECORD_PREVIOUS_KEY.
+        """
+        try:
+            return self._decrypt_own(ciphertext)
+        except ValueError:
+            if self.previous is None:
+                raise
+        return self.previous.decrypt(ciphertext), RECORD_PREVIOUS_KEY
+
+    def _decrypt_own(self, ciphertext: bytes) -> tuple[bytes, int]:
+        view = memoryview(ciphertext)
+        if len(view) >= _V2_OVERHEAD and view[0] == RECORD_V2:
+            try:
+                return self._aead.decrypt(bytes(view[1:13]), view[13:], _V2_HEADER), RECORD_V2
+            except InvalidTag:
+                # Puede ser un registro v1 cuyo IV empieza por 0x02
+                pass
+        return self._decrypt_v1(view), RECORD_V1
+
+    def needs_upgrade(self, version: int) -> bool:
+        """True si un registro de esa versión debería reescribirse con el formato actual"""
+        return version != self.version
+
+    def _decrypt_v1(self, view: memoryview) -> bytes:
         """Descifra datos usando AES-CBC + HMAC-SHA256"""
-        if len(ciphertext) < 48:
+        if len(view) < 48:
             raise ValueError("Ciphertext too short")
         
-        iv = ciphertext[:16]
-        mac = ciphertext[16:48]
-        encrypted_data = ciphertext[48:]
+        # Vistas sin copia sobre IV, MAC y datos
+        iv = view[:16]
+        mac = view[16:48]
+        encrypted_data = view[48:]
         
-        h = hmac.HMAC(self.key, hashes.SHA256(), backend=self.backend)
-        h.update(iv + encrypted_data)
+        h = self._hmac.copy()
+        h.update(iv)
+        h.update(encrypted_data)
         try:
-            h.verify(mac)
+            h.verify(bytes(mac))
         except Exception:
             raise ValueError("HMAC verification failed - data may be corrupted")
         
-        cipher = Cipher(algorithms.AES(self.key), modes.CBC(iv), backend=self.backend)
+        cipher = Cipher(self._algorithm, modes.CBC(bytes(iv)), backend=self.backend)
         decryptor = cipher.decryptor()
         padded_plaintext = decryptor.update(encrypted_data) + decryptor.finalize()
         return self._unpad_pkcs7(padded_plaintext)
+
+    def encrypt_many(self, plaintexts) -> list:
+        """
+        Cifra varios elementos reutilizando las primitivas (un solo os.urandom para todos los IV).
+        Devuelve una lista alineada con la entrada; None donde un elemento no se pudo cifrar.
+        """
+        plaintexts = list(plaintexts)
+        if self.version == RECORD_V1:
+            size, encrypt = 16, self._encrypt
+        else:
+            size, encrypt = 12, self._encrypt_v2
+        ivs = memoryview(os.urandom(size * len(plaintexts)))
+        out = []
+        for i, plaintext in enumerate(plaintexts):
+            try:
+                out.append(encrypt(plaintext, bytes(ivs[size * i:size * (i + 1)])))
+            except Exception:
+                out.append(None)
+        return out
+
+    def decrypt_many(self, ciphertexts, versioned: bool = False) -> list:
+        """
+        Descifra varios elementos sin lanzar excepciones.
+        Devuelve una lista alineada con la entrada; None donde un elemento falló (MAC, padding...).
+        Con versioned=True cada elemento es (plaintext, versión) como en decrypt_versioned().
+        """
+        decrypt = self.decrypt_versioned if versioned else self.decrypt
+        out = []
+        for ciphertext in ciphertexts:
+            try:
+                out.append(decrypt(ciphertext))
+            except Exception:
+                out.append(None)
+        return out
+
+    def decrypt_parallel(self, ciphertexts, threshold: int | None = None, versioned: bool = False) -> list:
+        """
+        Como decrypt_many() pero repartiendo el trabajo entre DECRYPT_WORKERS hilos
+        (OpenSSL libera el GIL). Por debajo de 'threshold' elementos se hace en serie.
+        """
+        ciphertexts = list(ciphertexts)
+        if threshold is None:
+            threshold = config.PARALLEL_DECRYPT_THRESHOLD
+        workers = _decrypt_workers()
+        if workers <= 1 or len(ciphertexts) < max(threshold, 2):
+            return self.decrypt_many(ciphertexts, versioned)
+
+        size = -(-len(ciphertexts) // workers)
+        parts = [ciphertexts[i:i + size] for i in range(0, len(ciphertexts), size)]
+        out = []
+        for part in _decrypt_executor().map(lambda part: self.decrypt_many(part, versioned), parts):
+            out.extend(part)
+        return out
+
+    def _encrypt_v2(self, plaintext: bytes, nonce: bytes) -> bytes:
+        # El byte de versión va autenticado como dato asociado
+        return b"".join((_V2_HEADER, nonce, self._aead.encrypt(nonce, plaintext, _V2_HEADER)))
+
+    def _encrypt(self, plaintext: bytes, iv: bytes) -> bytes:
+        encryptor = Cipher(self._algorithm, modes.CBC(iv), backend=self.backend).encryptor()
+        ciphertext = encryptor.update(self._pad_pkcs7(plaintext)) + encryptor.finalize()
+        
+        h = self._hmac.copy()
+        h.update(iv)
+        h.update(ciphertext)
+        mac = h.finalize()
+        
+        return b"".join((iv, mac, ciphertext))
     
     def _pad_pkcs7(self, data: bytes, block_size: int = 16) -> bytes:
         """Aplica padding PKCS7"""
@@ -66,9 +186,29 @@ class AESEncryption:
             raise ValueError("Invalid padding")
         return data[:-padding_length]
 
-def get_encryption_key():
-    """Obtiene la clave de encriptación desde el keyring del sistema"""
-    service_name = "KeyPass"
+# Pool de hilos compartido para el descifrado en paralelo (se crea al primer uso)
+_executor = None
+_executor_lock = threading.Lock()
+
+def _decrypt_workers() -> int:
+    """Hilos de descifrado: DECRYPT_WORKERS o, si es 0, según los núcleos disponibles"""
+    return config.DECRYPT_WORKERS or min(8, os.cpu_count() or 1)
+
+def _decrypt_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=_decrypt_workers(), thread_name_prefix="keypass-decrypt")
+        return _executor
+
+# Entradas del keyring
+SERVICE_NAME = "KeyPass"
+ROTATION_SERVICE_NAME = "KeyPass-Rotation"  # clave nueva mientras dura una rotación
+RETIRED_SERVICE_NAME = "KeyPass-Retired"  # clave anterior a la última rotación (no se descarta)
+
+def _read_keyring_key() -> bytes:
+    """Lee (o crea) la clave AES del keyring del sistema"""
+    service_name = SERVICE_NAME
     username = getpass.getuser()
     
     try:
@@ -84,4 +224,280 @@ def get_encryption_key():
     except Exception as e:
         raise Exception(f"Failed to access system keyring: {e}. Please ensure keyring is properly configured.")
     
-    return AESEncryption(key)
+    return key
+
+def _read_rotation_key() -> bytes | None:
+    """Clave nueva de una rotación sin terminar, o None"""
+    try:
+        key_str = keyring.get_password(ROTATION_SERVICE_NAME, getpass.getuser())
+    except Exception as e:
+        raise Exception(f"Failed to access system keyring: {e}. Please ensure keyring is properly configured.")
+    return base64.b64decode(key_str) if key_str else None
+
+def _delete_rotation_key() -> None:
+    try:
+        keyring.delete_password(ROTATION_SERVICE_NAME, getpass.getuser())
+    except keyring.errors.PasswordDeleteError:
+        pass
+
+def _promote_rotation_key(pending: bytes) -> None:
+    """
+    Hace de la clave nueva la clave de la bóveda en el keyring. La anterior no se
+    sobrescribe sin más: se guarda en RETIRED_SERVICE_NAME.
+    """
+    try:
+        old_str = keyring.get_password(SERVICE_NAME, getpass.getuser())
+    except Exception as e:
+        raise Exception(f"Failed to access system keyring: {e}. Please ensure keyring is properly configured.")
+    if old_str and base64.b64decode(old_str) != pending:
+        _store_key(RETIRED_SERVICE_NAME, base64.b64decode(old_str))
+    _store_key(SERVICE_NAME, pending)
+    _delete_rotation_key()
+
+def key_fingerprint(key: bytes) -> str:
+    """Identificador estable de una clave (HKDF con su propio 'info')"""
+    return HKDF(algorithm=hashes.SHA256(), length=16, salt=None, info=b"KeyPass key id").derive(key).hex()
+
+
+# ================== Estado de la clave en la base de datos ==================
+# settings.vault_key_id          = huella de la clave con la que está cifrada la bóveda
+# settings.vault_rotation_key_id = huella de la clave nueva mientras dura una rotación
+# Las escrituras comprueban, dentro de su transacción, que cifran con la clave que
+# indica la base de datos; así ningún cifrador cacheado (u otro proceso) escribe con
+# una clave retirada.
+KEY_ID_SETTING = "vault_key_id"
+ROTATION_KEY_ID_SETTING = "vault_rotation_key_id"
+
+
+class StaleKeyError(Exception):
+    """El cifrador usado ya no es el de escritura (la clave rotó): hay que recargarlo"""
+
+
+def _read_key_state(conn) -> tuple:
+    """(vault_key_id, vault_rotation_key_id) según la tabla settings"""
+    rows = dict(conn.execute(
+        "SELECT key, value FROM settings WHERE key IN (?, ?)", (KEY_ID_SETTING, ROTATION_KEY_ID_SETTING)
+    ).fetchall())
+    return rows.get(KEY_ID_SETTING), rows.get(ROTATION_KEY_ID_SETTING)
+
+
+def key_state() -> tuple:
+    conn = get_connection()
+    try:
+        return _read_key_state(conn)
+    finally:
+        release_connection(conn)
+
+
+def check_write_key(conn, cipher: AESEncryption) -> None:
+    """
+    Operación de escritura: lanza StaleKeyError si 'cipher' no cifra con la clave de
+    escritura actual. Se llama dentro de la transacción del hilo escritor.
+    """
+    vault_id, rotation_id = _read_key_state(conn)
+    expected = rotation_id or vault_id
+    if expected is not None and cipher.key_id != expected:
+        raise StaleKeyError("The vault key changed; reload it and retry")
+
+
+def _init_key_id(conn, key_id: str) -> None:
+    conn.execute("INSERT OR IGNORE INTO settings(key, value) VALUES (?, ?)", (KEY_ID_SETTING, key_id))
+
+
+def _store_key(service: str, key: bytes) -> None:
+    try:
+        keyring.set_password(service, getpass.getuser(), base64.b64encode(key).decode('utf-8'))
+    except Exception as e:
+        raise Exception(f"Failed to access system keyring: {e}. Please ensure keyring is properly configured.")
+
+
+def _load_vault_cipher() -> tuple:
+    """
+    Cifrador de la bóveda según el keyring y la base de datos.
+    Con una rotación en curso escribe con la clave nueva y lee también con la anterior.
+    Devuelve (cifrador, estado de la clave en la base de datos).
+    """
+    current = _read_keyring_key()
+    pending = _read_rotation_key()
+    keys = {key_fingerprint(current): current}
+    if pending is not None:
+        keys[key_fingerprint(pending)] = pending
+
+    vault_id, rotation_id = key_state()
+    if vault_id is None:
+        # Base de datos anterior a las huellas: la clave del keyring es la de la bóveda
+        vault_id = key_fingerprint(current)
+        run_write(_init_key_id, vault_id)
+        vault_id, rotation_id = key_state()
+
+    vault_key = keys.get(vault_id)
+    if vault_key is None:
+        raise Exception("The system keyring does not hold the key this vault is encrypted with")
+
+    if rotation_id is None:
+        if pending is not None and vault_key == pending:
+            # La rotación se confirmó en la base de datos pero no llegó a promoverse en el keyring
+            _promote_rotation_key(pending)
+        elif pending is not None and pending == current:
+            _delete_rotation_key()
+        return AESEncryption(vault_key), (vault_id, rotation_id)
+
+    new_key = keys.get(rotation_id)
+    if new_key is None:
+        raise Exception("The key rotation in progress has no new key in the system keyring")
+    return AESEncryption(new_key, previous=AESEncryption(vault_key)), (vault_id, rotation_id)
+
+def key_rotation_pending() -> bool:
+    """True si hay una rotación de clave empezada y sin terminar"""
+    return key_state()[1] is not None
+
+def _start_rotation(conn, vault_id: str, rotation_id: str) -> None:
+    _init_key_id(conn, vault_id)
+    current_vault, current_rotation = _read_key_state(conn)
+    if current_rotation is not None and current_rotation != rotation_id:
+        raise Exception("Another key rotation is already in progress")
+    if current_vault != vault_id:
+        raise StaleKeyError("The vault key changed; reload it and retry")
+    conn.execute("INSERT OR REPLACE INTO settings(key, value) VALUES (?, ?)", (ROTATION_KEY_ID_SETTING, rotation_id))
+
+def begin_key_rotation() -> None:
+    """
+    Genera la clave nueva (si no hay ya una rotación en curso) y la registra en la
+    base de datos: desde ese commit todas las escrituras deben usar la clave nueva.
+    """
+    if key_rotation_pending():
+        key_provider.lock()
+        return
+    current = _read_keyring_key()
+    vault_id = key_state()[0] or key_fingerprint(current)
+    if vault_id != key_fingerprint(current):
+        # Quedó una promoción a medias: la resuelve la carga normal
+        key_provider.lock()
+        key_provider.get()
+        current = _read_keyring_key()
+        vault_id = key_fingerprint(current)
+    pending = _read_rotation_key()
+    if pending is None or pending == current:
+        pending = os.urandom(32)
+        _store_key(ROTATION_SERVICE_NAME, pending)
+    run_write(_start_rotation, vault_id, key_fingerprint(pending))
+    key_provider.lock()
+
+def _finish_rotation(conn, rotation_id: str) -> None:
+    """Confirma en la base de datos que la bóveda ya está cifrada con la clave nueva"""
+    if _read_key_state(conn)[1] != rotation_id:
+        raise StaleKeyError("The key rotation changed while it was running")
+    conn.execute("UPDATE settings SET value=? WHERE key=?", (rotation_id, KEY_ID_SETTING))
+    conn.execute("DELETE FROM settings WHERE key=?", (ROTATION_KEY_ID_SETTING,))
+
+def complete_key_rotation(finalize=None) -> None:
+    """
+    Hace definitiva la clave nueva. 'finalize(conn)', si se da, se ejecuta en la misma
+    transacción del hilo escritor antes de confirmar (el último repaso de registros);
+    si lanza una excepción la rotación sigue en curso y no se toca el keyring.
+    Después se promueve la clave en el keyring, conservando la anterior como retirada.
+    """
+    pending = _read_rotation_key()
+    if pending is None:
+        return
+    rotation_id = key_fingerprint(pending)
+
+    def _op(conn):
+        if finalize is not None:
+            finalize(conn)
+        _finish_rotation(conn, rotation_id)
+
+    if key_state()[1] is not None:
+        run_write(_op)
+    if key_state()[0] != rotation_id:
+        # La base de datos no está cifrada con la clave nueva: no se puede promover
+        raise StaleKeyError("The key rotation was not committed")
+    _promote_rotation_key(pending)
+    key_provider.lock()
+
+
+class KeyProvider:
+    """
+    Mantiene en memoria la clave de la bóveda durante la sesión.
+    El keyring solo se consulta al desbloquear; la clave se descarta tras
+    `idle_timeout` segundos sin uso o al llamar a lock() (logout).
+    """
+    def __init__(self, idle_timeout: int = config.KEY_IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._aes = None
+        self._last_used = 0.0
+        self._timer = None  # vence al agotarse la inactividad y descarta la clave
+        self._state = None  # estado de la clave en la base de datos al cargarla
+
+    def _expired(self, now: float) -> bool:
+        return self.idle_timeout > 0 and now - self._last_used > self.idle_timeout
+
+    def _arm_timer(self, delay: float) -> None:
+        """Programa la comprobación de inactividad (con self._lock tomado)"""
+        timer = threading.Timer(delay, self._on_timer)
+        timer.daemon = True
+        self._timer = timer
+        timer.start()
+
+    def _cancel_timer(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _on_timer(self) -> None:
+        # Un solo temporizador por desbloqueo: si hubo uso entretanto, se reprograma
+        # por el tiempo que falta en lugar de crear uno nuevo en cada get()
+        with self._lock:
+            if self._aes is None or self._timer is not threading.current_thread():
+                return
+            remaining = self._last_used + self.idle_timeout - time.monotonic()
+            if remaining > 0:
+                self._arm_timer(remaining)
+                return
+            self._timer = None
+            self._aes = None
+            self._last_used = 0.0
+
+    def unlock(self) -> AESEncryption:
+        """Carga la clave desde el keyring si no está ya en memoria"""
+        with self._lock:
+            now = time.monotonic()
+            if self._aes is not None and not self._expired(now) and key_state() != self._state:
+                # Otro proceso (o una rotación) cambió la clave de la bóveda
+                self._aes = None
+            if self._aes is None or self._expired(now):
+                self._aes, self._state = _load_vault_cipher()
+                self._cancel_timer()
+                if self.idle_timeout > 0:
+                    self._arm_timer(self.idle_timeout)
+            self._last_used = now
+            return self._aes
+
+    def get(self) -> AESEncryption:
+        """Devuelve el cifrador de la sesión, desbloqueando si hace falta"""
+        return self.unlock()
+
+    def lock(self) -> None:
+        """Olvida la clave en memoria"""
+        with self._lock:
+            self._cancel_timer()
+            self._aes = None
+            self._state = None
+            self._last_used = 0.0
+
+    def is_unlocked(self) -> bool:
+        with self._lock:
+            return self._aes is not None and not self._expired(time.monotonic())
+
+
+# Proveedor de clave compartido por todo el proceso
+key_provider = KeyProvider()
+
+def get_encryption_key():
+    """Obtiene el cifrador de la bóveda (el keyring se consulta una vez por sesión)"""
+    return key_provider.get()
+
+def lock_vault() -> None:
+    """Descarta la clave en memoria (logout)"""
+    key_provider.lock()
@@ -1,34 +1,123 @@
 # -*- coding: utf-8 -*-
 import os
 import hmac
+import time
 import sqlite3
 import hashlib
+import math
+import threading
 from typing import Optional, Tuple
-from pathlib import Path
+from Logic.db import get_connection, release_connection, run_write, get_setting, set_setting
+from Logic.rate_limit import RateLimiter
 import config
 
-ALGO = config.ENCRYPTION_ALGORITHM
+ALGO = config.ENCRYPTION_ALGORITHM  # algoritmo de los hashes nuevos (prefijo del registro)
+PBKDF2_ALGO = "pbkdf2_sha256"
+SCRYPT_ALGO = "scrypt"
 DEFAULT_ITER = config.DEFAULT_ITERATIONS
 SALT_BYTES = config.SALT_BYTES
 
-# Directorio de datos local
-DATA_DIR = Path(__file__).resolve().parent.parent / "db"
-DATA_DIR.mkdir(exist_ok=True)
-DB_FILE = DATA_DIR / "keypass.db"
+_policy_lock = threading.Lock()
+_policy_iter = None  # iteraciones calibradas (se leen o calculan una vez por proceso)
+# Ajuste donde se guarda la calibración de este equipo: "<target_ms>:<iteraciones>"
+CALIBRATION_SETTING = "pbkdf2_calibration"
+# Solo se rehace un hash PBKDF2 si está por debajo de este porcentaje de la política
+# (la calibración tiene ruido: sin margen se rehasharía en muchos logins)
+REHASH_RATIO = 0.8
+_dummy_record = None  # hash de referencia para logins que no existen
+
+# Intentos de login: se rechazan antes de derivar nada si se supera el ritmo
+login_limiter = RateLimiter(
+    config.LOGIN_BURST, config.LOGIN_ATTEMPTS_PER_MINUTE,
+    config.LOGIN_GLOBAL_BURST, config.LOGIN_GLOBAL_ATTEMPTS_PER_MINUTE,
+    config.LOGIN_LIMITER_SIZE,
+)
+
+
+class LoginThrottled(Exception):
+    """Demasiados intentos de login; retry_after = segundos a esperar (inf = sin reintento)"""
+    def __init__(self, retry_after: float):
+        self.retry_after = retry_after
+        if math.isinf(retry_after):
+            message = "Too many login attempts. Further attempts are blocked until KeyPass is restarted."
+        else:
+            message = f"Too many login attempts. Try again in {max(1, round(retry_after))} s."
+        super().__init__(message)
+
+# Búsqueda por email o usuario: dos sondeos de índice único en lugar de un OR
+_LOOKUP_SQL = "SELECT {cols} FROM login WHERE email=? UNION ALL SELECT {cols} FROM login WHERE usuario=? LIMIT 1"
 
 def _conn():
-    """Conexión a SQLite"""
-    return sqlite3.connect(DB_FILE)
+    """Conexión a SQLite del pool compartido (devolver con release_connection)"""
+    return get_connection()
 def _pbkdf2(password: str, salt: bytes, iterations: int = DEFAULT_ITER) -> bytes:
     return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
 
+def calibrate_iterations(target_ms: int | None = None) -> int:
+    """
+    Mide pbkdf2_hmac en este equipo y devuelve las iteraciones que tardan ~target_ms
+    (redondeadas a millares, nunca menos de DEFAULT_ITERATIONS).
+    """
+    if target_ms is None:
+        target_ms = config.PBKDF2_TARGET_MS
+    if target_ms <= 0:
+        return DEFAULT_ITER
+    salt = os.urandom(SALT_BYTES)
+    probe = 10000
+    elapsed = 0.0
+    # Repetir con más iteraciones hasta tener una medida fiable (>= 50 ms)
+    while True:
+        start = time.perf_counter()
+        hashlib.pbkdf2_hmac("sha256", b"calibration", salt, probe)
+        elapsed = time.perf_counter() - start
+        if elapsed >= 0.05 or probe >= 10_000_000:
+            break
+        probe *= 2
+    iterations = int(probe * (target_ms / 1000.0) / max(elapsed, 1e-6))
+    iterations = (iterations // 1000) * 1000
+    return max(DEFAULT_ITER, iterations)
+
+def policy_iterations() -> int:
+    """
+    Iteraciones PBKDF2 exigidas para los hashes nuevos. Se calibran una sola vez por
+    equipo y se guardan en la base de datos (se recalibra si cambia PBKDF2_TARGET_MS).
+    """
+    global _policy_iter
+    if _policy_iter is None:
+        with _policy_lock:
+            if _policy_iter is None:
+                _policy_iter = _load_or_calibrate()
+    return _policy_iter
+
+def _load_or_calibrate() -> int:
+    target_ms = config.PBKDF2_TARGET_MS
+    if target_ms <= 0:
+        return DEFAULT_ITER
+    try:
+        saved = get_setting(CALIBRATION_SETTING)
+    except sqlite3.Error:
+        saved = None
+    if saved:
+        try:
+            saved_target, saved_iter = (int(part) for part in saved.split(":"))
+            if saved_target == target_ms:
+                return max(DEFAULT_ITER, saved_iter)
+        except ValueError:
+            pass
+    iterations = calibrate_iterations(target_ms)
+    try:
+        set_setting(CALIBRATION_SETTING, f"{target_ms}:{iterations}")
+    except sqlite3.Error:
+        pass
+    return iterations
+
 def _encode_record(iterations: int, salt: bytes, dk: bytes) -> str:
-    return f"{ALGO}${iterations}${salt.hex()}${dk.hex()}"
+    return f"{PBKDF2_ALGO}${iterations}${salt.hex()}${dk.hex()}"
 
 def _decode_record(record: str) -> Optional[Tuple[int, bytes, bytes]]:
     """Devuelve (iterations, salt_bytes, hash_bytes) o None si no es formato PBKDF2."""
     parts = record.split("$")
-    if len(parts) == 4 and parts[0] == ALGO:
+    if len(parts) == 4 and parts[0] == PBKDF2_ALGO:
         try:
             iterations = int(parts[1])
             salt = bytes.fromhex(parts[2])
@@ -38,6 +127,102 @@ def _decode_record(record: str) -> Optional[Tuple[int, bytes, bytes]]:
             return None
     return None
 
+
+# ================== Hashers ==================
+class Pbkdf2Hasher:
+    """pbkdf2_sha256$iteraciones$sal$hash"""
+    name = PBKDF2_ALGO
+
+    def hash(self, password: str) -> str:
+        iterations = policy_iterations()
+        salt = os.urandom(SALT_BYTES)
+        return _encode_record(iterations, salt, _pbkdf2(password, salt, iterations))
+
+    def verify(self, password: str, record: str) -> bool:
+        parsed = _decode_record(record)
+        if parsed is None:
+            return False
+        iterations, salt, good_dk = parsed
+        return hmac.compare_digest(_pbkdf2(password, salt, iterations), good_dk)
+
+    def needs_rehash(self, record: str) -> bool:
+        parsed = _decode_record(record)
+        if parsed is None:
+            return True
+        # Por debajo del mínimo siempre; respecto a la calibración, con margen
+        return parsed[0] < max(DEFAULT_ITER, int(policy_iterations() * REHASH_RATIO))
+
+
+class ScryptHasher:
+    """scrypt$n$r$p$sal$hash (memoria ~128·n·r bytes por login)"""
+    name = SCRYPT_ALGO
+    DKLEN = 32
+
+    @staticmethod
+    def _derive(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+        return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+                              maxmem=128 * n * r * (p + 1) + (1 << 20), dklen=ScryptHasher.DKLEN)
+
+    @staticmethod
+    def _decode(record: str):
+        parts = record.split("$")
+        if len(parts) != 6 or parts[0] != SCRYPT_ALGO:
+            return None
+        try:
+            return int(parts[1]), int(parts[2]), int(parts[3]), bytes.fromhex(parts[4]), bytes.fromhex(parts[5])
+        except ValueError:
+            return None
+
+    def hash(self, password: str) -> str:
+        n, r, p = config.SCRYPT_N, config.SCRYPT_R, config.SCRYPT_P
+        salt = os.urandom(SALT_BYTES)
+        dk = self._derive(password, salt, n, r, p)
+        return f"{SCRYPT_ALGO}${n}${r}${p}${salt.hex()}${dk.hex()}"
+
+    def verify(self, password: str, record: str) -> bool:
+        parsed = self._decode(record)
+        if parsed is None:
+            return False
+        n, r, p, salt, good_dk = parsed
+        try:
+            candidate = self._derive(password, salt, n, r, p)
+        except ValueError:
+            return False
+        return hmac.compare_digest(candidate, good_dk)
+
+    def needs_rehash(self, record: str) -> bool:
+        parsed = self._decode(record)
+        if parsed is None:
+            return True
+        n, r, p = parsed[:3]
+        return n < config.SCRYPT_N or r < config.SCRYPT_R or p < config.SCRYPT_P
+
+
+# Prefijo del registro -> hasher
+HASHERS = {}
+
+def register_hasher(hasher) -> None:
+    """Registra un hasher (objeto con name, hash, verify y needs_rehash)"""
+    HASHERS[hasher.name] = hasher
+
+register_hasher(Pbkdf2Hasher())
+register_hasher(ScryptHasher())
+
+def _hasher_for(record: str):
+    """Hasher que corresponde al prefijo del registro, o None (formatos heredados)"""
+    return HASHERS.get(record.split("$", 1)[0])
+
+def _active_hasher():
+    hasher = HASHERS.get(ALGO)
+    if hasher is None:
+        raise ValueError(f"Unknown password hashing algorithm: {ALGO}")
+    return hasher
+
+def needs_rehash(record: str) -> bool:
+    """True si el hash guardado no usa el algoritmo actual o sus parámetros están por debajo de la política"""
+    hasher = _hasher_for(record)
+    return hasher is None or hasher.name != ALGO or hasher.needs_rehash(record)
+
 def _sha256_hex(password: str) -> str:
     return hashlib.sha256(password.encode("utf-8")).hexdigest()
 
@@ -49,80 +234,130 @@ def user_exists(email: str = "", usuario: str = "") -> bool:
     conn = _conn()
     try:
         cur = conn.cursor()
-        cur.execute("SELECT 1 FROM login WHERE email=? OR usuario=? LIMIT 1", (email, usuario))
+        cur.execute(
+            "SELECT 1 FROM login WHERE email=? UNION ALL SELECT 1 FROM login WHERE usuario=? LIMIT 1",
+            (email, usuario),
+        )
         found = cur.fetchone() is not None
         return found
     finally:
-        conn.close()
+        release_connection(conn)
+
 
+def _insert_user(conn: sqlite3.Connection, email: str, usuario: str, record: str) -> int:
+    return conn.execute("INSERT INTO login(email, usuario, pass) VALUES(?,?,?)", (email, usuario, record)).lastrowid
 
 def create_user(email: str, usuario: str, password: str) -> int:
     """Crea un nuevo usuario en SQLite"""
     email = email.strip().lower()
     usuario = usuario.strip().lower()
 
-    salt = os.urandom(SALT_BYTES)
-    dk = _pbkdf2(password, salt, DEFAULT_ITER)
-    record = _encode_record(DEFAULT_ITER, salt, dk)
-
-    conn = _conn()
     try:
-        cur = conn.cursor()
-        cur.execute("INSERT INTO login(email, usuario, pass) VALUES(?,?,?)", (email, usuario, record))
-        new_id = cur.lastrowid
-        conn.commit()
-        return new_id
+        # El hash (lento) se calcula antes de encolar la escritura
+        return run_write(_insert_user, email, usuario, _hash_password(password))
     except Exception:
         return 0
-    finally:
-        conn.close()
 
 
-def verify_user(login: str, password: str) -> bool:
-    """Verifica credenciales desde SQLite. Acepta email o usuario en 'login'."""
-    login = login.strip().lower()
+def authenticate(login: str, password: str) -> int | None:
+    """
+    Verifica credenciales con una sola consulta. Acepta email o usuario en 'login'.
+    Devuelve el id del usuario si son correctas; None en caso contrario.
+    Lanza LoginThrottled si ese login (o la aplicación) supera el ritmo de intentos.
+    """
+    login = (login or "").strip().lower()
+    if not login:
+        return None
+    wait = login_limiter.acquire(login)
+    if wait > 0:
+        raise LoginThrottled(wait)
+    _ensure_dummy_record()
+    user_id = _check_credentials(login, password)
+    if user_id is not None:
+        login_limiter.reset(login)
+    return user_id
+
+
+def _ensure_dummy_record() -> None:
+    """
+    Crea el hash ficticio antes de buscar el login: si se creara al llegar el primer
+    login inexistente, esa petición haría dos derivaciones y delataría que no existe.
+    """
+    global _dummy_record
+    if _dummy_record is not None:
+        return
+    policy_iterations()  # calibrar antes de tomar el lock (policy_iterations también lo usa)
+    with _policy_lock:
+        if _dummy_record is None:
+            _dummy_record = _hash_password(os.urandom(16).hex())
+
+
+def _dummy_verify(password: str) -> None:
+    """Deriva contra un hash ficticio para que un login inexistente tarde lo mismo"""
+    _active_hasher().verify(password, _dummy_record)
+
+
+def _check_credentials(login: str, password: str) -> int | None:
     conn = _conn()
     try:
         cur = conn.cursor()
-        cur.execute("SELECT id, pass FROM login WHERE email=? OR usuario=? LIMIT 1", (login, login))
+        cur.execute(_LOOKUP_SQL.format(cols="id, pass"), (login, login))
         row = cur.fetchone()
         if not row:
-            return False
+            _dummy_verify(password)
+            return None
 
         user_id, stored = row
 
-        # Verificar con PBKDF2
-        parsed = _decode_record(stored)
-        if parsed is not None:
-            iterations, salt, good_dk = parsed
-            candidate = _pbkdf2(password, salt, iterations)
-            ok = hmac.compare_digest(candidate, good_dk)
-            return ok
+        # Verificar con el hasher del prefijo (pbkdf2_sha256, scrypt, ...)
+        hasher = _hasher_for(stored)
+        if hasher is not None:
+            ok = hasher.verify(password, stored)
+            if ok and needs_rehash(stored):
+                # Pasar al algoritmo y coste de la política actual
+                _rehash(user_id, password, stored)
+            return user_id if ok else None
 
         # Verificar con SHA256 (migración)
         if len(stored) == 64 and all(c in "0123456789abcdef" for c in stored.lower()):
             ok = hmac.compare_digest(_sha256_hex(password), stored)
             if ok:
-                _migrate_to_pbkdf2(user_id, password, conn)
-            return ok
+                _rehash(user_id, password, stored)
+            return user_id if ok else None
 
         # Verificar texto plano (migración)
         ok = hmac.compare_digest(password, stored)
         if ok:
-            _migrate_to_pbkdf2(user_id, password, conn)
-        return ok
+            _rehash(user_id, password, stored)
+        return user_id if ok else None
     finally:
-        conn.close()
+        release_connection(conn)
 
 
-def _migrate_to_pbkdf2(user_id: int, password: str, conn: sqlite3.Connection) -> None:
-    """Actualiza el usuario a formato PBKDF2 en SQLite."""
-    salt = os.urandom(SALT_BYTES)
-    dk = _pbkdf2(password, salt, DEFAULT_ITER)
-    record = _encode_record(DEFAULT_ITER, salt, dk)
-    cur = conn.cursor()
-    cur.execute("UPDATE login SET pass=? WHERE id=?", (record, user_id))
-    conn.commit()
+def verify_user(login: str, password: str) -> bool:
+    """Verifica credenciales desde SQLite. Acepta email o usuario en 'login'."""
+    try:
+        return authenticate(login, password) is not None
+    except LoginThrottled:
+        return False
+
+
+def _hash_password(password: str) -> str:
+    """Hash con sal nueva usando el algoritmo y los parámetros de la política"""
+    return _active_hasher().hash(password)
+
+
+def _rehash(user_id: int, password: str, old_record: str) -> None:
+    """Reescribe el hash del usuario con la política actual (si nadie lo cambió entretanto)"""
+    record = _hash_password(password)
+    try:
+        run_write(_replace_hash, user_id, old_record, record)
+    except sqlite3.Error:
+        # El login es válido aunque no se haya podido actualizar el hash
+        pass
+
+def _replace_hash(conn: sqlite3.Connection, user_id: int, old_record: str, record: str) -> None:
+    conn.execute("UPDATE login SET pass=? WHERE id=? AND pass=?", (record, user_id, old_record))
 
 def get_user_profile(user_id: int) -> tuple | None:
     """Obtiene el perfil del usuario desde SQLite"""
@@ -133,7 +368,24 @@ def get_user_profile(user_id: int) -> tuple | None:
         row = cur.fetchone()
         return row
     finally:
-        conn.close()
+        release_connection(conn)
+
+
+def _update_profile(conn: sqlite3.Connection, user_id: int, new_email: str, new_usuario: str) -> bool:
+    cur = conn.cursor()
+    
+    # Verificar que no esté en uso por otro usuario (en la misma transacción que el UPDATE)
+    cur.execute(
+        "SELECT id FROM login WHERE email=? AND id!=? "
+        "UNION ALL SELECT id FROM login WHERE usuario=? AND id!=? LIMIT 1",
+        (new_email, user_id, new_usuario, user_id),
+    )
+    if cur.fetchone():
+        return False
+    
+    # Actualizar perfil
+    cur.execute("UPDATE login SET email=?, usuario=? WHERE id=?", (new_email, new_usuario, user_id))
+    return cur.rowcount > 0
 
 
 def update_user_profile(user_id: int, new_email: str, new_usuario: str) -> bool:
@@ -145,21 +397,7 @@ def update_user_profile(user_id: int, new_email: str, new_usuario: str) -> bool:
         if not new_email or not new_usuario:
             return False
         
-        conn = _conn()
-        try:
-            cur = conn.cursor()
-            
-            # Verificar que no esté en uso por otro usuario
-            cur.execute("SELECT id FROM login WHERE (email=? OR usuario=?) AND id!=?", (new_email, new_usuario, user_id))
-            if cur.fetchone():
-                return False
-            
-            # Actualizar perfil
-            cur.execute("UPDATE login SET email=?, usuario=? WHERE id=?", (new_email, new_usuario, user_id))
-            conn.commit()
-            return cur.rowcount > 0
-        finally:
-            conn.close()
+        return run_write(_update_profile, user_id, new_email, new_usuario)
     except Exception:
         return False
     
@@ -174,8 +412,8 @@ def get_user_id(login: str) -> int | None:
     conn = _conn()
     try:
         cur = conn.cursor()
-        cur.execute("SELECT id FROM login WHERE email=? OR usuario=? LIMIT 1", (login, login))
+        cur.execute(_LOOKUP_SQL.format(cols="id"), (login, login))
         row = cur.fetchone()
         return row[0] if row else None
     finally:
-        conn.close()
\ No newline at end of file
+        release_connection(conn)
\ No newline at end of file
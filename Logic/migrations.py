@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""Migraciones del esquema de db/keypass.db versionadas con PRAGMA user_version"""
+import sqlite3
+
+
+def _m001_base_schema(conn: sqlite3.Connection) -> None:
+    """Esquema inicial: usuarios, contraseñas e índices"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS login (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT UNIQUE NOT NULL,
+            usuario TEXT UNIQUE NOT NULL,
+            pass TEXT NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS keypass (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            site TEXT NOT NULL,
+            user_name TEXT NOT NULL,
+            pass BLOB NOT NULL,
+            user_id INTEGER NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES login(id)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_login_email ON login(email)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_login_usuario ON login(usuario)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_keypass_user_id ON keypass(user_id)")
+
+
+def _m002_login_nocase(conn: sqlite3.Connection) -> None:
+    """
+    login con email/usuario COLLATE NOCASE y unicidad en ux_login_email / ux_login_usuario.
+    Se rehace la tabla (conservando los id) para quitar los UNIQUE implícitos.
+    """
+    implicit = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='index' AND tbl_name='login' "
+        "AND name LIKE 'sqlite_autoindex_login_%' LIMIT 1"
+    ).fetchone()
+    if implicit:
+        conn.execute("""
+            CREATE TABLE login_new (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                email TEXT NOT NULL COLLATE NOCASE,
+                usuario TEXT NOT NULL COLLATE NOCASE,
+                pass TEXT NOT NULL
+            )
+        """)
+        conn.execute("INSERT INTO login_new(id, email, usuario, pass) SELECT id, email, usuario, pass FROM login")
+        conn.execute("DROP TABLE login")
+        conn.execute("ALTER TABLE login_new RENAME TO login")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_login_email ON login(email)")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_login_usuario ON login(usuario)")
+    # Redundantes con los índices únicos
+    conn.execute("DROP INDEX IF EXISTS idx_login_email")
+    conn.execute("DROP INDEX IF EXISTS idx_login_usuario")
+
+
+def _m003_keypass_user_listing_index(conn: sqlite3.Connection) -> None:
+    """
+    Índice (user_id, id DESC) que cubre el listado (site, user_name): las páginas
+    por usuario se leen del índice en orden, sin ordenar ni tocar la tabla.
+    Sustituye a idx_keypass_user_id, que es prefijo suyo.
+    """
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_keypass_user_listing ON keypass(user_id, id DESC, site, user_name)")
+    conn.execute("DROP INDEX IF EXISTS idx_keypass_user_id")
+
+
+def _m004_keypass_fts(conn: sqlite3.Connection) -> None:
+    """
+    Índice FTS5 (tokenizador trigram: búsqueda por subcadena) sobre site/user_name,
+    con contenido externo en keypass y sincronizado por triggers.
+    Si este SQLite no trae FTS5/trigram no se crea y la búsqueda usa LIKE.
+    """
+    try:
+        conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS keypass_fts USING fts5("
+            "site, user_name, content='keypass', content_rowid='id', tokenize='trigram')"
+        )
+    except sqlite3.OperationalError:
+        return
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS keypass_fts_ai AFTER INSERT ON keypass BEGIN
+            INSERT INTO keypass_fts(rowid, site, user_name) VALUES (new.id, new.site, new.user_name);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS keypass_fts_ad AFTER DELETE ON keypass BEGIN
+            INSERT INTO keypass_fts(keypass_fts, rowid, site, user_name) VALUES ('delete', old.id, old.site, old.user_name);
+        END
+    """)
+    # Solo cuando cambian los metadatos (re-cifrar 'pass' no toca el índice)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS keypass_fts_au AFTER UPDATE OF site, user_name ON keypass BEGIN
+            INSERT INTO keypass_fts(keypass_fts, rowid, site, user_name) VALUES ('delete', old.id, old.site, old.user_name);
+            INSERT INTO keypass_fts(rowid, site, user_name) VALUES (new.id, new.site, new.user_name);
+        END
+    """)
+    conn.execute("INSERT INTO keypass_fts(keypass_fts) VALUES ('rebuild')")
+
+
+def _m005_settings(conn: sqlite3.Connection) -> None:
+    """Ajustes propios de este equipo/base de datos (p. ej. la calibración de PBKDF2)"""
+    conn.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+
+# (versión, descripción, función). Solo se añaden al final; nunca se modifica una ya publicada.
+MIGRATIONS = [
+    (1, "base schema", _m001_base_schema),
+    (2, "case-insensitive unique login indexes", _m002_login_nocase),
+    (3, "covering index for per-user listings", _m003_keypass_user_listing_index),
+    (4, "FTS5 search over site and user name", _m004_keypass_fts),
+    (5, "settings table", _m005_settings),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> list:
+    """
+    Aplica en orden las migraciones pendientes, cada una en su propia transacción
+    junto con su PRAGMA user_version. Si el esquema está al día solo lee el pragma.
+    Devuelve las versiones aplicadas.
+    """
+    current = schema_version(conn)
+    if current == LATEST_VERSION:
+        return []
+    if current > LATEST_VERSION:
+        raise RuntimeError(f"Database schema version {current} is newer than this KeyPass ({LATEST_VERSION})")
+
+    applied = []
+    for version, _description, step in MIGRATIONS:
+        if version <= current:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Otro proceso puede haberla aplicado mientras esperábamos el bloqueo
+            if schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            step(conn)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version)
+    return applied
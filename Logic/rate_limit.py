@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""Limitador de intentos en memoria (token bucket por clave y global)"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBucket:
+    """
+    Cubo de 'capacity' fichas que se rellena a 'rate' fichas por segundo.
+    No es seguro entre hilos por sí solo: lo protege el RateLimiter.
+    """
+    __slots__ = ("capacity", "rate", "tokens", "stamp")
+
+    def __init__(self, capacity: float, rate: float, now: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.stamp = now
+
+    def _refill(self, now: float) -> None:
+        if now > self.stamp:
+            self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+
+    def take(self, now: float) -> bool:
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def wait_time(self, now: float) -> float:
+        """Segundos hasta que haya una ficha (inf si no se rellena: rate <= 0)"""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        if self.rate <= 0:
+            return float("inf")
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    Un cubo por clave (en una tabla LRU de tamaño fijo) más uno global.
+    Un intento se permite solo si hay ficha en los dos.
+    """
+    def __init__(self, per_key_burst: int, per_key_per_minute: float,
+                 global_burst: int, global_per_minute: float, max_keys: int = 1024):
+        self.per_key_burst = per_key_burst
+        self.per_key_rate = per_key_per_minute / 60.0
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()  # clave -> TokenBucket (la más reciente al final)
+        self._global = TokenBucket(global_burst, global_per_minute / 60.0, time.monotonic())
+
+    def _bucket(self, key: str, now: float) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.per_key_burst, self.per_key_rate, now)
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def acquire(self, key: str) -> float:
+        """
+        Intenta consumir una ficha de la clave y otra del global.
+        Devuelve 0 si se permite, o los segundos que hay que esperar (inf si el cubo
+        no se rellena nunca).
+        """
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._bucket(key, now)
+            wait = max(bucket.wait_time(now), self._global.wait_time(now))
+            if wait > 0:
+                return wait
+            bucket.take(now)
+            self._global.take(now)
+            return 0.0
+
+    def reset(self, key: str) -> None:
+        """Olvida el historial de una clave (p. ej. tras un login correcto)"""
+        with self._lock:
+            self._buckets.pop(key, None)
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""Rotación de la clave de cifrado: re-cifra la bóveda por lotes y se puede reanudar"""
+import sys
+from pathlib import Path
+
+# Permitir `python Logic/rekey.py` además de `python -m Logic.rekey`
+BASE = Path(__file__).resolve().parent.parent
+if str(BASE) not in sys.path:
+    sys.path.insert(0, str(BASE))
+
+from Logic.encryption import (
+    AESEncryption, get_encryption_key, begin_key_rotation, complete_key_rotation, key_rotation_pending,
+    check_write_key,
+)
+from Logic.db import get_connection, release_connection, run_write
+import config
+
+
+class KeyRotationError(Exception):
+    """Hay registros que no se pudieron pasar a la clave nueva: la rotación no se completa"""
+
+
+def rotation_pending() -> bool:
+    """True si una rotación quedó a medias (hay que reanudarla con iter_rotate_key)"""
+    return key_rotation_pending()
+
+
+def _reencrypt(f, rows) -> tuple:
+    """
+    Parámetros UPDATE (nuevo, id, antiguo) de las filas que aún no usan la clave nueva,
+    y cuántas filas no se pudieron re-cifrar (ilegibles con ambas claves o fallo al cifrar).
+    """
+    stale = []
+    failed = 0
+    # Descifrado del lote repartido entre hilos (decrypt_parallel); None = ilegible con ambas claves
+    for (record_id, blob), result in zip(rows, f.decrypt_parallel((row[1] for row in rows), versioned=True)):
+        if result is None:
+            failed += 1
+        elif f.needs_upgrade(result[1]):
+            stale.append((record_id, blob, result[0]))
+    blobs = f.encrypt_many(plain for _id, _blob, plain in stale)
+    updates = [(new, record_id, old) for (record_id, old, _plain), new in zip(stale, blobs) if new is not None]
+    return updates, failed + len(stale) - len(updates)
+
+
+def _apply_updates(conn, f, updates) -> None:
+    # La rotación sigue siendo la misma y solo si nadie cambió la fila entretanto
+    check_write_key(conn, f)
+    conn.executemany("UPDATE keypass SET pass=? WHERE id=? AND pass=?", updates)
+
+
+def _count_unreadable(conn, f, batch_size) -> int:
+    """Registros que la clave nueva (sin la anterior) no descifra, recorriendo la tabla por id"""
+    new_only = AESEncryption(f.key, f.version)
+    unreadable = 0
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, pass FROM keypass WHERE id > ? ORDER BY id LIMIT ?", (last_id, batch_size)
+        ).fetchall()
+        if not rows:
+            return unreadable
+        unreadable += sum(plain is None for plain in new_only.decrypt_parallel(row[1] for row in rows))
+        last_id = rows[-1][0]
+
+
+def iter_rotate_key(batch_size=None):
+    """
+    Re-cifra todos los registros con una clave nueva recorriendo la tabla por id.
+    Es un generador: produce (procesados, total) tras cada lote.
+
+    La clave nueva se registra (keyring + base de datos) antes de empezar; desde ese
+    commit toda escritura debe usarla, lo que se comprueba dentro de cada transacción.
+    Cada lote se confirma por separado en el hilo escritor, así que si se interrumpe
+    basta con volver a llamarla: los registros que ya descifra la clave nueva se saltan.
+    El último repaso (filas añadidas durante el recorrido) y la promoción de la clave
+    se hacen en una sola transacción, que antes comprueba que la clave nueva descifra
+    todos los registros. Si algún registro no se pudo re-cifrar se lanza KeyRotationError
+    y la rotación queda en curso (la clave anterior sigue disponible).
+    """
+    if batch_size is None:
+        batch_size = config.REKEY_BATCH_SIZE
+    begin_key_rotation()
+    f = get_encryption_key()
+    if f.previous is None:
+        raise RuntimeError("No key rotation in progress")
+
+    conn = get_connection()
+    try:
+        total = conn.execute("SELECT COUNT(*) FROM keypass").fetchone()[0]
+        done = 0
+        failed = 0
+        last_id = 0
+        while True:
+            rows = conn.execute(
+                "SELECT id, pass FROM keypass WHERE id > ? ORDER BY id LIMIT ?",
+                (last_id, batch_size),
+            ).fetchall()
+            if not rows:
+                break
+            updates, skipped = _reencrypt(f, rows)
+            failed += skipped
+            if updates:
+                run_write(_apply_updates, f, updates)
+            last_id = rows[-1][0]
+            done += len(rows)
+            yield done, max(total, done)
+    finally:
+        release_connection(conn)
+
+    if failed:
+        raise KeyRotationError(f"{failed} records could not be re-encrypted; the previous key was kept")
+
+    def _tail(write_conn):
+        rows = write_conn.execute("SELECT id, pass FROM keypass WHERE id > ? ORDER BY id", (last_id,)).fetchall()
+        updates, _skipped = _reencrypt(f, rows)
+        if updates:
+            _apply_updates(write_conn, f, updates)
+        # Ningún registro puede depender todavía de la clave anterior
+        unreadable = _count_unreadable(write_conn, f, batch_size)
+        if unreadable:
+            raise KeyRotationError(f"{unreadable} records are not readable with the new key; the previous key was kept")
+
+    complete_key_rotation(finalize=_tail)
+
+
+def rotate_key(batch_size=None) -> int:
+    """Rota la clave de una vez; devuelve el número de registros recorridos"""
+    done = 0
+    for done, _total in iter_rotate_key(batch_size):
+        pass
+    return done
+
+
+# ================== CLI ==================
+def main(argv=None) -> int:
+    """python -m Logic.rekey"""
+    from Logic.database_init import init_database
+
+    init_database()
+    resumed = rotation_pending()
+    done = rotate_key()
+    print(f"Key rotation {'resumed and ' if resumed else ''}completed: {done} records processed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""Índice de búsqueda en memoria (trigramas) sobre sitio/usuario"""
+from collections import defaultdict
+
+
+def normalize(rec: dict) -> str:
+    """Texto normalizado en el que se busca: 'sitio usuario' en minúsculas"""
+    return f"{rec.get('sitio', '')} {rec.get('usuario', '')}".lower()
+
+
+def _trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SearchIndex:
+    """
+    Índice de subcadenas sobre los metadatos de la bóveda.
+    Las consultas de 3+ caracteres intersectan las listas de trigramas y luego
+    verifican la subcadena; las más cortas recorren el texto ya normalizado.
+    Los resultados salen en orden id DESC (el mismo que la lista).
+    """
+    def __init__(self):
+        self._records = {}              # id -> registro
+        self._text = {}                 # id -> texto normalizado
+        self._grams = defaultdict(set)  # trigrama -> ids
+
+    def __len__(self):
+        return len(self._records)
+
+    def get(self, rec_id) -> dict | None:
+        return self._records.get(rec_id)
+
+    def build(self, records) -> None:
+        """Reconstruye el índice completo"""
+        self.clear()
+        self.extend(records)
+
+    def clear(self) -> None:
+        self._records.clear()
+        self._text.clear()
+        self._grams.clear()
+
+    def extend(self, records) -> None:
+        """Añade un lote de registros nuevos (ids que aún no están en el índice)"""
+        grams = self._grams
+        for rec in records:
+            rec_id = rec.get("id")
+            text = normalize(rec)
+            self._records[rec_id] = rec
+            self._text[rec_id] = text
+            for i in range(len(text) - 2):
+                grams[text[i:i + 3]].add(rec_id)
+
+    def add(self, rec: dict) -> None:
+        """Añade (o reindexa) un registro"""
+        rec_id = rec.get("id")
+        if rec_id in self._records:
+            self.remove(rec_id)
+        text = normalize(rec)
+        self._records[rec_id] = rec
+        self._text[rec_id] = text
+        for gram in _trigrams(text):
+            self._grams[gram].add(rec_id)
+
+    def remove(self, rec_id) -> None:
+        text = self._text.pop(rec_id, None)
+        self._records.pop(rec_id, None)
+        if text is None:
+            return
+        for gram in _trigrams(text):
+            ids = self._grams.get(gram)
+            if ids is not None:
+                ids.discard(rec_id)
+                if not ids:
+                    del self._grams[gram]
+
+    def search(self, query: str) -> list:
+        """Registros cuyo 'sitio usuario' contiene la consulta"""
+        q = (query or "").strip().lower()
+        if not q:
+            ids = self._records.keys()
+        elif len(q) < 3:
+            ids = [i for i, text in self._text.items() if q in text]
+        else:
+            postings = []
+            for gram in _trigrams(q):
+                ids = self._grams.get(gram)
+                if not ids:
+                    return []
+                postings.append(ids)
+            postings.sort(key=len)
+            candidates = set(postings[0]).intersection(*postings[1:])
+            ids = [i for i in candidates if q in self._text[i]]
+        return [self._records[i] for i in sorted(ids, reverse=True)]
@@ -1,76 +1,321 @@
 # -*- coding: utf-8 -*-
-from Logic.encryption import get_encryption_key
-import sqlite3
-from pathlib import Path
+from Logic.encryption import get_encryption_key, check_write_key, key_provider, StaleKeyError
+from Logic.db import get_connection, release_connection, run_write, submit_write
+import threading
+import time
 import config
 
-# Directorio de datos local
-DATA_DIR = Path(__file__).resolve().parent.parent / "db"
-DATA_DIR.mkdir(exist_ok=True)
+# Caché de estadísticas por usuario; se invalida en cada escritura
+_stats_lock = threading.Lock()
+_stats_cache = {}
+_last_write = {}
+_stats_generation = {}  # user_id -> contador de escrituras (descarta cálculos que se solapan con una)
 
-# Archivo de base de datos SQLite
-DB_FILE = DATA_DIR / "keypass.db"
+# Oyentes de cambios: callback(evento, user_id, registro)
+# evento es "inserted", "updated" o "deleted"; registro es {'id', 'sitio', 'usuario'} (solo 'id' al borrar)
+# "reset" (registro vacío) indica un cambio masivo: hay que recargar
+_listeners_lock = threading.Lock()
+_listeners = []
+
+# Si la base de datos tiene el índice FTS5 (se comprueba una vez)
+_fts_available = None
 
 def _conn():
-    """Conexión a SQLite"""
-    return sqlite3.connect(DB_FILE)
+    """Conexión a SQLite del pool compartido (devolver con release_connection)"""
+    return get_connection()
+
+def add_change_listener(callback):
+    """Registra un callback que recibe cada escritura en la bóveda"""
+    with _listeners_lock:
+        if callback not in _listeners:
+            _listeners.append(callback)
+
+def remove_change_listener(callback):
+    with _listeners_lock:
+        if callback in _listeners:
+            _listeners.remove(callback)
+
+def _publish(event, user_id, record):
+    """Notifica un cambio a los oyentes; un oyente que falla no afecta a la escritura"""
+    with _listeners_lock:
+        listeners = list(_listeners)
+    for callback in listeners:
+        try:
+            callback(event, user_id, record)
+        except Exception:
+            pass
+
+def _invalidate_stats(user_id):
+    """Descarta las estadísticas cacheadas tras una escritura"""
+    with _stats_lock:
+        _stats_cache.pop(user_id, None)
+        _last_write[user_id] = time.time()
+        _stats_generation[user_id] = _stats_generation.get(user_id, 0) + 1
+
+
+def _page(conn, user_id, after_id, limit, columns="id, site, user_name"):
+    """
+    Una página de registros del usuario en orden id DESC (paginación por clave):
+    los de id menor que after_id, como mucho 'limit' (None = todos).
+    """
+    if after_id is None:
+        sql = f"SELECT {columns} FROM keypass WHERE user_id=? ORDER BY id DESC LIMIT ?"
+        params = (user_id, -1 if limit is None else limit)
+    else:
+        sql = f"SELECT {columns} FROM keypass WHERE user_id=? AND id<? ORDER BY id DESC LIMIT ?"
+        params = (user_id, after_id, -1 if limit is None else limit)
+    return conn.execute(sql, params).fetchall()
+
+def list_passwords(user_id, after_id=None, limit=None):
+    """
+    Lista los registros de un usuario sin descifrar nada, en orden id DESC.
+    Paginación por clave: after_id = último id de la página anterior, limit = tamaño de página
+    (ambos opcionales; sin ellos devuelve todo). Cada página cuesta lo mismo por profunda que sea.
+    Devuelve [{'id', 'sitio', 'usuario'}, ...]; la contraseña se obtiene con reveal_password().
+    """
+    conn = _conn()
+    try:
+        return [{"id": row[0], "sitio": row[1], "usuario": row[2]}
+                for row in _page(conn, user_id, after_id, limit)]
+    except Exception:
+        return []
+    finally:
+        release_connection(conn)
+
+def _iter_pages(user_id, batch_size, first_batch=None, columns="id, site, user_name"):
+    """Recorre las páginas del usuario sin mantener un cursor (ni una lectura) abierto entre lotes"""
+    after_id = None
+    size = first_batch or batch_size
+    while True:
+        conn = _conn()
+        try:
+            rows = _page(conn, user_id, after_id, size, columns)
+        finally:
+            release_connection(conn)
+        if rows:
+            yield rows
+        if len(rows) < size:
+            break
+        after_id = rows[-1][0]
+        size = batch_size
+
+def iter_passwords(user_id, batch_size=500, first_batch=None):
+    """
+    Igual que list_passwords() pero por lotes (páginas por clave, sin cargar todo).
+    El primer lote puede ser más pequeño (first_batch) para mostrar algo cuanto antes.
+    """
+    for rows in _iter_pages(user_id, batch_size, first_batch):
+        yield [{"id": row[0], "sitio": row[1], "usuario": row[2]} for row in rows]
 
+def iter_password_rows(user_id, batch_size=500):
+    """
+    Filas crudas (id, sitio, usuario, pass cifrado) por lotes, en orden id DESC.
+    Para procesos masivos (exportar, re-cifrar) que descifran por lotes.
+    """
+    yield from _iter_pages(user_id, batch_size, columns="id, site, user_name, pass")
 
-def _load_all_passwords(user_id):
-    """Carga todas las contraseñas de un usuario desde SQLite"""
+def _has_fts(conn) -> bool:
+    global _fts_available
+    if _fts_available is None:
+        row = conn.execute("SELECT 1 FROM sqlite_master WHERE name='keypass_fts'").fetchone()
+        _fts_available = row is not None
+    return _fts_available
+
+def search_passwords(user_id, query, limit=50):
+    """
+    Busca en sitio/usuario sin descifrar nada y devuelve [{'id', 'sitio', 'usuario'}, ...].
+    Con 3+ caracteres usa el índice FTS5 (trigramas) y ordena por relevancia;
+    con menos, o si no hay FTS5, filtra con LIKE en orden id DESC.
+    """
+    q = (query or "").strip()
+    if not q:
+        return list_passwords(user_id, limit=limit)
+    lim = -1 if limit is None else limit
+    conn = _conn()
+    try:
+        if len(q) >= 3 and _has_fts(conn):
+            # Frase entre comillas: la consulta se busca literal (sin operadores FTS)
+            phrase = '"' + q.replace('"', '""') + '"'
+            rows = conn.execute(
+                "SELECT k.id, k.site, k.user_name FROM keypass_fts "
+                "JOIN keypass k ON k.id = keypass_fts.rowid "
+                "WHERE keypass_fts MATCH ? AND k.user_id=? ORDER BY rank LIMIT ?",
+                (phrase, user_id, lim),
+            ).fetchall()
+        else:
+            pattern = "%" + q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            rows = conn.execute(
+                "SELECT id, site, user_name FROM keypass WHERE user_id=? "
+                "AND (site LIKE ? ESCAPE '\\' OR user_name LIKE ? ESCAPE '\\') ORDER BY id DESC LIMIT ?",
+                (user_id, pattern, pattern, lim),
+            ).fetchall()
+        return [{"id": row[0], "sitio": row[1], "usuario": row[2]} for row in rows]
+    except Exception:
+        return []
+    finally:
+        release_connection(conn)
+
+def reveal_password(record_id, user_id):
+    """Descifra la contraseña de un único registro; None si no existe o no se puede descifrar"""
     conn = _conn()
     try:
         cur = conn.cursor()
-        cur.execute("SELECT id, site, user_name, pass FROM keypass WHERE user_id=? ORDER BY id DESC", (user_id,))
-        rows = cur.fetchall()
+        cur.execute("SELECT pass FROM keypass WHERE id=? AND user_id=?", (record_id, user_id))
+        row = cur.fetchone()
+        if not row:
+            return None
+        f = get_encryption_key()
+        plain, version = f.decrypt_versioned(row[0])
+        if f.needs_upgrade(version):
+            _upgrade_record(f, record_id, row[0], f.encrypt(plain))
+        return plain.decode('utf-8')
+    except Exception:
+        return None
+    finally:
+        release_connection(conn)
 
+def _upgrade_record(f, record_id, old_blob, new_blob):
+    """
+    Reescribe un registro con el formato actual (solo si nadie lo cambió entretanto).
+    No espera al commit: si falla, se reintentará la próxima vez que se lea.
+    """
+    submit_write(_checked_write, f, _exec_rowcount,
+                 "UPDATE keypass SET pass=? WHERE id=? AND pass=?", (new_blob, record_id, old_blob))
+
+def _checked_write(conn, f, op, *args):
+    """Operación de escritura: comprueba en la transacción que 'f' cifra con la clave vigente"""
+    check_write_key(conn, f)
+    return op(conn, *args)
+
+def _encrypted_write(encrypt, op, *args):
+    """
+    Cifra con encrypt(f) y ejecuta op(conn, cifrado, *args) en el hilo escritor.
+    Si la clave de la bóveda rotó entretanto (StaleKeyError), recarga el cifrador
+    y lo intenta una vez más.
+    """
+    for attempt in range(2):
         f = get_encryption_key()
-        salida = []
-        for row in rows:
-            try:
-                pwd = f.decrypt(row[3]).decode('utf-8')  # row[3] es la columna 'pass'
-            except Exception:
-                pwd = "<decryption-error>"
-            salida.append({
-                "id": row[0], 
-                "sitio": row[1], 
-                "usuario": row[2], 
-                "contraseña": pwd
-            })
-        return salida
+        data = encrypt(f)
+        try:
+            return run_write(_checked_write, f, op, data, *args)
+        except StaleKeyError:
+            if attempt:
+                raise
+            key_provider.lock()
+
+def _exec_rowcount(conn, sql, params) -> int:
+    """Operación de escritura: ejecuta una sentencia y devuelve las filas afectadas"""
+    return conn.execute(sql, params).rowcount
+
+def get_vault_stats(user_id):
+    """
+    Estadísticas de la bóveda calculadas en SQL (sin descifrar), cacheadas hasta la próxima escritura.
+    Devuelve {'count': int, 'sites': {sitio: n}, 'last_modified': float | None}.
+    """
+    with _stats_lock:
+        cached = _stats_cache.get(user_id)
+        generation = _stats_generation.get(user_id, 0)
+    if cached is not None:
+        return cached
+
+    conn = _conn()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT site, COUNT(*) FROM keypass WHERE user_id=? GROUP BY site", (user_id,))
+        sites = {row[0]: row[1] for row in cur.fetchall()}
+        stats = {"count": sum(sites.values()), "sites": sites, "last_modified": _last_write.get(user_id)}
     except Exception:
-        return []
+        return {"count": 0, "sites": {}, "last_modified": None}
     finally:
-        conn.close()
+        release_connection(conn)
+
+    with _stats_lock:
+        # Si una escritura se confirmó mientras se calculaba, el resultado puede estar
+        # desfasado: se devuelve pero no se cachea
+        if _stats_generation.get(user_id, 0) == generation:
+            _stats_cache[user_id] = stats
+    return stats
 
 def delete_password(record_id, user_id):
     """Elimina una contraseña de SQLite"""
-    conn = _conn()
     try:
-        cur = conn.cursor()
-        cur.execute("DELETE FROM keypass WHERE id=? AND user_id=?", (record_id, user_id))
-        conn.commit()
-        return cur.rowcount > 0
+        deleted = run_write(_exec_rowcount, "DELETE FROM keypass WHERE id=? AND user_id=?", (record_id, user_id))
+        _invalidate_stats(user_id)
+        if deleted > 0:
+            _publish("deleted", user_id, {"id": record_id})
+            return True
+        return False
     except Exception:
         return False
-    finally:
-        conn.close()
+
+def _update_record(conn, enc, record_id, user_id, sitio, usuario) -> int:
+    return conn.execute(
+        "UPDATE keypass SET site=?, user_name=?, pass=? WHERE id=? AND user_id=?",
+        (sitio, usuario, enc, record_id, user_id),
+    ).rowcount
+
+def update_password(record_id, user_id, sitio, usuario, contraseña):
+    """Actualiza un registro existente en una sola transacción (mantiene el id)"""
+    try:
+        updated = _encrypted_write(
+            lambda f: f.encrypt(contraseña.encode('utf-8')),
+            _update_record, record_id, user_id, sitio, usuario,
+        )
+        if updated > 0:
+            _invalidate_stats(user_id)
+            _publish("updated", user_id, {"id": record_id, "sitio": sitio, "usuario": usuario})
+            return True
+        return False
+    except Exception:
+        return False
+
+def _insert_password(conn, enc, sitio, usuario, user_id) -> int:
+    cur = conn.execute("INSERT INTO keypass(site, user_name, pass, user_id) VALUES (?,?,?,?)",
+                       (sitio, usuario, enc, user_id))
+    return cur.lastrowid
 
 def save_password(sitio, usuario, contraseña, user_id):
     """Guarda una contraseña en SQLite"""
     try:
-        f = get_encryption_key()
-        enc = f.encrypt(contraseña.encode('utf-8'))
-
-        conn = _conn()
-        try:
-            cur = conn.cursor()
-            cur.execute("INSERT INTO keypass(site, user_name, pass, user_id) VALUES (?,?,?,?)", (sitio, usuario, enc, user_id))
-            conn.commit()
-            return True
-        except Exception:
-            return False
-        finally:
-            conn.close()
+        new_id = _encrypted_write(
+            lambda f: f.encrypt(contraseña.encode('utf-8')),
+            _insert_password, sitio, usuario, user_id,
+        )
+        _invalidate_stats(user_id)
+        _publish("inserted", user_id, {"id": new_id, "sitio": sitio, "usuario": usuario})
+        return True
     except Exception:
         return False
+
+
+def _encrypt_entries(f, entries) -> list:
+    blobs = f.encrypt_many(contraseña.encode('utf-8') for _sitio, _usuario, contraseña in entries)
+    if any(blob is None for blob in blobs):
+        raise ValueError("Failed to encrypt some entries")
+    return blobs
+
+def _insert_many(conn, blobs, entries, user_id) -> None:
+    params = [(sitio, usuario, blob, user_id) for (sitio, usuario, _c), blob in zip(entries, blobs)]
+    conn.executemany("INSERT INTO keypass(site, user_name, pass, user_id) VALUES (?,?,?,?)", params)
+
+def save_passwords_bulk(user_id, entries, notify=True):
+    """
+    Guarda muchas contraseñas [(sitio, usuario, contraseña), ...] en una sola transacción.
+    Devuelve el número de filas insertadas (0 si falla; en ese caso no se guarda ninguna).
+    Con notify=False no publica "reset" (quien inserta por lotes llama a notify_reset al final).
+    """
+    if not entries:
+        return 0
+    entries = list(entries)
+    try:
+        _encrypted_write(lambda f: _encrypt_entries(f, entries), _insert_many, entries, user_id)
+    except Exception:
+        return 0
+    _invalidate_stats(user_id)
+    if notify:
+        _publish("reset", user_id, {})
+    return len(entries)
+
+def notify_reset(user_id):
+    """Avisa a los oyentes de un cambio masivo (tras una importación por lotes)"""
+    _publish("reset", user_id, {})
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""Exportación e importación de la bóveda por lotes (sin cargarla entera en memoria)"""
+import argparse
+import csv
+import getpass
+import json
+import os
+import sys
+from pathlib import Path
+
+# Permitir `python Logic/transfer.py` además de `python -m Logic.transfer`
+BASE = Path(__file__).resolve().parent.parent
+if str(BASE) not in sys.path:
+    sys.path.insert(0, str(BASE))
+
+from Logic.encryption import get_encryption_key
+from Logic.storage import iter_password_rows, get_vault_stats, save_passwords_bulk, notify_reset
+import config
+
+# Columnas del CSV exportado
+CSV_FIELDS = ['Sitio', 'Usuario', 'Contraseña']
+
+
+def iter_export_csv(user_id, path, chunk_size=None):
+    """
+    Escribe las contraseñas del usuario en 'path' leyendo y descifrando por lotes.
+    Es un generador: produce (escritas, total) tras cada lote para informar del progreso.
+    Si se cierra antes de terminar (cancelación) se borra el archivo a medias.
+    """
+    if chunk_size is None:
+        chunk_size = config.EXPORT_CHUNK_SIZE
+    path = Path(path)
+    total = get_vault_stats(user_id)["count"]
+    written = 0
+    completed = False
+    try:
+        with open(path, 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(CSV_FIELDS)
+            for rows in iter_password_rows(user_id, chunk_size):
+                # Por lote: si la clave rota durante la exportación se usa la vigente
+                f = get_encryption_key()
+                out = []
+                for (_id, sitio, usuario, _blob), plain in zip(rows, f.decrypt_parallel(row[3] for row in rows)):
+                    try:
+                        pwd = plain.decode('utf-8')
+                    except Exception:
+                        pwd = "<decryption-error>"
+                    out.append((sitio, usuario, pwd))
+                writer.writerows(out)
+                written += len(out)
+                yield written, total
+        completed = True
+    finally:
+        if not completed:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def export_csv(user_id, path, chunk_size=None) -> int:
+    """Exporta a CSV de una vez; devuelve el número de filas escritas"""
+    written = 0
+    for written, _total in iter_export_csv(user_id, path, chunk_size):
+        pass
+    return written
+
+
+# ================== Importación ==================
+def _entry(row: dict):
+    """(sitio, usuario, contraseña) de una fila exportada; None si le falta algo"""
+    row = {str(k).strip().lower(): v for k, v in row.items() if k is not None}
+    sitio = str(row.get('sitio') or '').strip()
+    usuario = str(row.get('usuario') or '').strip()
+    clave = str(row.get('contraseña') or '')
+    if not sitio or not usuario or not clave:
+        return None
+    return sitio, usuario, clave
+
+
+def read_entries(path):
+    """
+    Lee un archivo exportado (CSV con las columnas de CSV_FIELDS, o JSON con una
+    lista de objetos con esas mismas claves). Produce (sitio, usuario, contraseña) o None.
+    """
+    path = Path(path)
+    if path.suffix.lower() == '.json':
+        with open(path, encoding='utf-8') as fh:
+            data = json.load(fh)
+        if not isinstance(data, list):
+            raise ValueError("JSON must contain a list of entries")
+        for row in data:
+            yield _entry(row) if isinstance(row, dict) else None
+    else:
+        with open(path, newline='', encoding='utf-8-sig') as fh:
+            for row in csv.DictReader(fh):
+                yield _entry(row)
+
+
+def iter_import(user_id, path, chunk_size=None):
+    """
+    Importa un archivo exportado cifrando e insertando por lotes (una transacción por lote).
+    Es un generador: produce (importadas, omitidas) tras cada lote. Los oyentes de
+    Logic.storage reciben un único "reset" al final.
+    """
+    if chunk_size is None:
+        chunk_size = config.EXPORT_CHUNK_SIZE
+    imported = skipped = 0
+    chunk = []
+    try:
+        for entry in read_entries(path):
+            if entry is None:
+                skipped += 1
+                continue
+            chunk.append(entry)
+            if len(chunk) >= chunk_size:
+                imported += _import_chunk(user_id, chunk)
+                chunk = []
+                yield imported, skipped
+        if chunk:
+            imported += _import_chunk(user_id, chunk)
+        yield imported, skipped
+    finally:
+        # Un solo aviso al terminar (o al cancelar/fallar) en lugar de uno por lote
+        if imported:
+            notify_reset(user_id)
+
+
+def _import_chunk(user_id, chunk) -> int:
+    saved = save_passwords_bulk(user_id, chunk, notify=False)
+    if saved != len(chunk):
+        raise RuntimeError("Failed to save imported passwords")
+    return saved
+
+
+def import_file(user_id, path, chunk_size=None):
+    """Importa un archivo de una vez; devuelve (importadas, omitidas)"""
+    result = (0, 0)
+    for result in iter_import(user_id, path, chunk_size):
+        pass
+    return result
+
+
+# ================== CLI ==================
+def main(argv=None) -> int:
+    """python -m Logic.transfer {import,export} <login> <archivo>"""
+    from Logic.database_init import init_database
+    from Logic.login import authenticate, LoginThrottled
+
+    parser = argparse.ArgumentParser(prog="python -m Logic.transfer", description="KeyPass import/export")
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("login", help="email or username")
+    parser.add_argument("file", help="CSV (or JSON for import) file")
+    args = parser.parse_args(argv)
+
+    init_database()
+    try:
+        user_id = authenticate(args.login, getpass.getpass("Password: "))
+    except LoginThrottled as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    if user_id is None:
+        print("Invalid credentials.", file=sys.stderr)
+        return 1
+
+    if args.command == "export":
+        print(f"Exported {export_csv(user_id, args.file)} passwords to {args.file}")
+    else:
+        imported, skipped = import_file(user_id, args.file)
+        print(f"Imported {imported} passwords ({skipped} skipped)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,14 +8,15 @@ if str(BASE) not in sys.path:
     sys.path.insert(0, str(BASE))
 
 from PyQt6.QtWidgets import (
-    QWidget, QLabel, QPushButton, QFrame, QApplication, QGraphicsDropShadowEffect
+    QWidget, QLabel, QPushButton, QFrame, QApplication, QGraphicsDropShadowEffect, QFileDialog
 )
 from PyQt6.QtCore import Qt, pyqtSignal
 from PyQt6.QtGui import QColor
 from Logic.session import load_session, clear_session
 from Logic.login import get_user_profile
-from Logic.storage import _load_all_passwords
-import csv
+from Logic.storage import get_vault_stats
+from Logic.transfer import iter_export_csv, iter_import
+from Main.workers import run_stream_in_background
 from datetime import datetime
 
 class Perfil_Window(QWidget):
@@ -29,6 +30,10 @@ class Perfil_Window(QWidget):
         self.user_id = None
         self.usuario = "N/A"
         self.email = "N/A"
+        self._export_worker = None  # exportación en curso
+        self._export_error = None
+        self._import_worker = None  # importación en curso
+        self._import_error = None
         
         
 
@@ -174,8 +179,8 @@ class Perfil_Window(QWidget):
         border: none;
         """)
         # Botón Export
-        self.export_btn = QPushButton("Export Passwords", card)
-        self.export_btn.setGeometry(40, 420, 180, 50)
+        self.export_btn = QPushButton("Export", card)
+        self.export_btn.setGeometry(40, 420, 125, 50)
         self.export_btn.setStyleSheet("""
             QPushButton {
                 background: #366CF0;
@@ -190,9 +195,15 @@ class Perfil_Window(QWidget):
         """)
         self.export_btn.clicked.connect(self.export_passwords)
 
+        # Botón Import
+        self.import_btn = QPushButton("Import", card)
+        self.import_btn.setGeometry(177, 420, 125, 50)
+        self.import_btn.setStyleSheet(self.export_btn.styleSheet())
+        self.import_btn.clicked.connect(self.import_passwords)
+
         # Botón Logout
         self.logout_btn = QPushButton("Logout", card)
-        self.logout_btn.setGeometry(250, 420, 120, 50)
+        self.logout_btn.setGeometry(314, 420, 126, 50)
         self.logout_btn.setStyleSheet("""
             QPushButton {
                 background: #EF4444;
@@ -209,7 +220,7 @@ class Perfil_Window(QWidget):
 
         # Mensajes
         self.msg_label = QLabel("", self)
-        self.msg_label.setGeometry(50, 620, 800, 30)
+        self.msg_label.setGeometry(50, 545, 800, 25)
         self.msg_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.msg_label.setStyleSheet("font-size: 14px; color: #6B7280;")
 
@@ -247,9 +258,9 @@ class Perfil_Window(QWidget):
         # Actualizar contador de contraseñas
         if self.user_id:
             try:
-                passwords = _load_all_passwords(self.user_id)
-                count = len(passwords) if passwords else 0
-                self.passwords_count.setText(str(count))
+                # COUNT en SQL, cacheado hasta la próxima escritura
+                stats = get_vault_stats(self.user_id)
+                self.passwords_count.setText(str(stats["count"]))
             except Exception:
                 self.passwords_count.setText("0")
         else:
@@ -263,36 +274,96 @@ class Perfil_Window(QWidget):
         self.msg_label.show()
         
     def export_passwords(self):
-        """Exporta las contraseñas a CSV"""
+        """Exporta las contraseñas a CSV en segundo plano (el botón pasa a cancelar)"""
+        if self._export_worker is not None:
+            self._export_worker.cancel()
+            self._show_message("Cancelando exportación...", "info")
+            return
+
         if not self.user_id:
             self._show_message("Error: Usuario no identificado", "error")
             return
             
         try:
-            passwords = _load_all_passwords(self.user_id)
-            if not passwords:
+            if not get_vault_stats(self.user_id)["count"]:
                 self._show_message("No hay contraseñas guardadas", "info")
                 return
             
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             filename = f"keypass_export_{timestamp}.csv"
-            
-            with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=['Sitio', 'Usuario', 'Contraseña'])
-                writer.writeheader()
-                for pwd in passwords:
-                    writer.writerow({
-                        'Sitio': pwd.get('sitio', ''),
-                        'Usuario': pwd.get('usuario', ''),
-                        'Contraseña': pwd.get('contraseña', '')
-                    })
-            
-            self._show_message(f"Exportado: {filename}", "success")
-            self._update_display()
+
+            self._export_error = None
+            self.export_btn.setText("Cancel")
+            self._show_message("Exportando...", "info")
+            self._export_worker = run_stream_in_background(
+                iter_export_csv, self.user_id, filename,
+                on_batch=self._on_export_progress,
+                on_error=self._on_export_error,
+                on_finished=lambda: self._on_export_finished(filename),
+            )
             
         except Exception as e:
             self._show_message(f"Error: {str(e)}", "error")
 
+    def _on_export_progress(self, progress):
+        written, total = progress
+        self._show_message(f"Exportando... {written}/{total}", "info")
+
+    def _on_export_error(self, error: str):
+        self._export_error = error
+
+    def _on_export_finished(self, filename: str):
+        worker, self._export_worker = self._export_worker, None
+        self.export_btn.setText("Export")
+        if self._export_error:
+            self._show_message(f"Error: {self._export_error}", "error")
+        elif worker is not None and worker.cancelled:
+            self._show_message("Exportación cancelada", "info")
+        else:
+            self._show_message(f"Exportado: {filename}", "success")
+
+    def import_passwords(self):
+        """Importa un CSV/JSON exportado en segundo plano, por lotes"""
+        if self._import_worker is not None:
+            return
+        if not self.user_id:
+            self._show_message("Error: Usuario no identificado", "error")
+            return
+
+        filename, _ = QFileDialog.getOpenFileName(
+            self, "Import Passwords", "", "CSV (*.csv);;JSON (*.json);;All files (*)"
+        )
+        if not filename:
+            return
+
+        self._import_error = None
+        self._import_progress = (0, 0)
+        self.import_btn.setEnabled(False)
+        self._show_message("Importando...", "info")
+        self._import_worker = run_stream_in_background(
+            iter_import, self.user_id, filename,
+            on_batch=self._on_import_progress,
+            on_error=self._on_import_error,
+            on_finished=self._on_import_finished,
+        )
+
+    def _on_import_progress(self, progress):
+        self._import_progress = progress
+        self._show_message(f"Importando... {progress[0]}", "info")
+
+    def _on_import_error(self, error: str):
+        self._import_error = error
+
+    def _on_import_finished(self):
+        self._import_worker = None
+        self.import_btn.setEnabled(True)
+        imported, skipped = self._import_progress
+        if self._import_error:
+            self._show_message(f"Error: {self._import_error} ({imported} importadas)", "error")
+        else:
+            self._show_message(f"Importadas: {imported} (omitidas: {skipped})", "success")
+        self._update_display()
+
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     w = Perfil_Window()
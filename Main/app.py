@@ -10,7 +10,8 @@ if str(BASE) not in sys.path:
 
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QLabel, QLineEdit, QPushButton, QToolButton, QHBoxLayout,
-    QCheckBox, QSlider, QGraphicsDropShadowEffect, QMenu, QStackedWidget, QVBoxLayout, QFrame
+    QCheckBox, QSlider, QGraphicsDropShadowEffect, QMenu, QStackedWidget, QVBoxLayout, QFrame,
+    QMessageBox
 )
 from PyQt6.QtCore import Qt, QPoint, QSize, pyqtSignal
 from PyQt6.QtGui import QColor, QIcon
@@ -23,7 +24,11 @@ from Main.password import View_Password
 from Main.signup_view import SignupView   # <-- vista de registro
 from Logic.session import has_session, load_session, clear_session
 from Logic.login import get_user_profile
+from Logic.encryption import lock_vault
 from Logic.database_init import init_database
+from Logic.db import close_all
+from Logic.rekey import iter_rotate_key, rotation_pending
+from Main.workers import run_in_background, run_stream_in_background
 import config
 
 
@@ -43,6 +48,7 @@ class Ventana(QWidget):
       
 
         self.current_user_id = None
+        self._rekey_worker = None  # rotación de clave en segundo plano
         
         # Inicializar base de datos
         init_database()
@@ -100,6 +106,7 @@ class Ventana(QWidget):
             self.current_user_id = user_id
             self.btn_ventana.setEnabled(True)
             self.mostrar_generador()
+            self._resume_key_rotation()
 
         self.login_view.authenticated.connect(_on_auth)
         self.login_view.ask_signup.connect(lambda: self.stack.setCurrentWidget(self.signup_view))
@@ -110,10 +117,7 @@ class Ventana(QWidget):
         # Conectar logout desde perfil
         self.perfil_widget.logout_requested.connect(self.logout)
 
-        # Refresco inmediato cuando se guarda una contraseña
-        self.pantalla_principal.password_saved.connect(
-            lambda payload: getattr(self.password_widget, "refresh", lambda: None)()
-        )
+        # La lista de contraseñas se actualiza sola con los eventos de Logic.storage
 
         # --- Autologin si existe sesión válida (AHORA que todo ya existe) ---
         try:
@@ -122,6 +126,7 @@ class Ventana(QWidget):
                 self.current_user_id = int(s["user"])
                 self.btn_ventana.setEnabled(True)
                 self.stack.setCurrentWidget(self.pantalla_principal)
+                self._resume_key_rotation()
             else:
                 self.stack.setCurrentWidget(self.login_view)
         except Exception:
@@ -218,6 +223,8 @@ class Ventana(QWidget):
         menu.addAction("Generator", self.mostrar_generador)
         menu.addAction("Password", self.mostrar_password)
         menu.addSeparator()
+        rotate = menu.addAction("Rotate encryption key", self.confirmar_rotacion)
+        rotate.setEnabled(self._rekey_worker is None)
         menu.addAction("Logout", self.logout)
         menu.setStyleSheet("""
             QMenu {
@@ -237,11 +244,54 @@ class Ventana(QWidget):
         menu_pos = QPoint(button_center.x() - 50, button_center.y() + 15)
         menu.exec(menu_pos)
 
+    # ---------- Rotación de la clave de cifrado ----------
+    def confirmar_rotacion(self):
+        answer = QMessageBox.question(
+            self, "Rotate encryption key",
+            "Re-encrypt every stored password with a new key?\n"
+            "KeyPass stays usable meanwhile; if it is closed, the rotation resumes on next login.",
+        )
+        if answer == QMessageBox.StandardButton.Yes:
+            self._start_key_rotation()
+
+    def _resume_key_rotation(self):
+        """Reanuda en segundo plano una rotación que quedó a medias"""
+        try:
+            pending = rotation_pending()
+        except Exception:
+            return
+        if pending:
+            self._start_key_rotation()
+
+    def _start_key_rotation(self):
+        if self._rekey_worker is not None:
+            return
+        self.title_label.setText("KeyPass — rotating key…")
+        self._rekey_worker = run_stream_in_background(
+            iter_rotate_key,
+            on_batch=self._on_rotation_progress,
+            on_error=self._on_rotation_error,
+            on_finished=self._on_rotation_finished,
+        )
+
+    def _on_rotation_progress(self, progress):
+        done, total = progress
+        self.title_label.setText(f"KeyPass — rotating key {done}/{total}")
+
+    def _on_rotation_error(self, message):
+        QMessageBox.warning(self, "Rotate encryption key", f"Key rotation stopped: {message}")
+
+    def _on_rotation_finished(self):
+        self._rekey_worker = None
+        self.title_label.setText("KeyPass")
+
     def logout(self):
         try:
             clear_session()
         except Exception:
             pass
+        # Olvidar la clave de la bóveda en memoria
+        lock_vault()
         self.current_user_id = None
         self.btn_ventana.setEnabled(False)
         self.stack.setCurrentWidget(self.login_view)
@@ -480,13 +530,24 @@ class PasswordGenerator(QWidget):
             # Obtener user_id de la ventana principal
             user_id = getattr(self.main_window, 'current_user_id', None)
             if user_id:
-                save_password(sitio, usuario, pwd, user_id)
-                # Notificar que hay una contraseña nueva (para refrescar otras vistas)
-                self.password_saved.emit({"site": sitio, "user": usuario})
+                # Cifrado y commit fuera del hilo de la interfaz
+                run_in_background(
+                    save_password, sitio, usuario, pwd, user_id,
+                    on_result=lambda ok, site=sitio, user=usuario: self._on_saved(ok, site, user),
+                    on_error=lambda _err: self._on_saved(False, sitio, usuario),
+                )
+
+    def _on_saved(self, ok: bool, sitio: str, usuario: str):
+        if not ok:
+            QMessageBox.warning(self, "Error", "No se pudo guardar la contraseña")
+            return
+        # Notificar que hay una contraseña nueva (para refrescar otras vistas)
+        self.password_saved.emit({"site": sitio, "user": usuario})
 
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
+    app.aboutToQuit.connect(close_all)
     w = Ventana()
     w.show()
     sys.exit(app.exec())
@@ -5,8 +5,9 @@ from PyQt6.QtWidgets import (
     QWidget, QLabel, QLineEdit, QPushButton, QVBoxLayout, QHBoxLayout,
     QCheckBox, QFrame, QGraphicsDropShadowEffect
 )
-from Logic.login import verify_user, get_user_id
+from Logic.login import authenticate
 from Logic.session import save_session
+from Main.workers import run_in_background
 
 class LoginView(QWidget):
     authenticated = pyqtSignal(int)
@@ -14,6 +15,7 @@ class LoginView(QWidget):
 
     def __init__(self, parent=None):
         super().__init__(parent)
+        self._auth_worker = None  # verificación PBKDF2 en curso
         self.setFixedSize(900, 600)
         self.setStyleSheet("background: #FAFAFA; font-family: Helvetica;")
 
@@ -199,7 +201,17 @@ class LoginView(QWidget):
         self.msg.setStyleSheet("color:#6B7280;")
         self.msg.setText(text)
 
+    def _set_busy(self, busy: bool):
+        """Bloquea el formulario mientras se verifica en segundo plano"""
+        self.btn_login.setEnabled(not busy)
+        self.btn_login.setText("Signing in..." if busy else "Log In")
+        self.input_email.setReadOnly(busy)
+        self.input_pw.setReadOnly(busy)
+        self.link_signup.setEnabled(not busy)
+
     def _do_login(self):
+        if self._auth_worker is not None:
+            return
         self.msg.clear()
         login = self.input_email.text().strip()
         pw = self.input_pw.text()
@@ -208,12 +220,21 @@ class LoginView(QWidget):
             self.msg.setStyleSheet("color:#B91C1C;")
             self.msg.setText("Please enter your credentials.")
             return
-            
-        ok = verify_user(login, pw)
-        if ok:
-            # Obtener id y guardar sesión si se pidió
-            uid = get_user_id(login)
-            if uid is not None and self.remember.isChecked():
+
+        # PBKDF2 es lento a propósito: se verifica fuera del hilo de la interfaz
+        self._set_busy(True)
+        self._info("Verifying credentials...")
+        self._auth_worker = run_in_background(
+            authenticate, login, pw,
+            on_result=self._on_login_result,
+            on_error=self._on_login_error,
+            on_finished=self._on_login_finished,
+        )
+
+    def _on_login_result(self, uid):
+        if uid is not None:
+            # Guardar sesión si se pidió
+            if self.remember.isChecked():
                 try:
                     save_session(uid, ttl_days=30)
                 except Exception:
@@ -221,7 +242,16 @@ class LoginView(QWidget):
 
             self.msg.setStyleSheet("color:#065F46;")
             self.msg.setText("Signed in.")
-            self.authenticated.emit(uid if uid is not None else 0)
+            self.authenticated.emit(uid)
         else:
             self.msg.setStyleSheet("color:#B91C1C;")
-            self.msg.setText("Invalid credentials.")
\ No newline at end of file
+            self.msg.setText("Invalid credentials.")
+
+    def _on_login_error(self, error: str):
+        self.msg.setStyleSheet("color:#B91C1C;")
+        self.msg.setText(f"Error signing in: {error}")
+
+    def _on_login_finished(self):
+        self._auth_worker = None
+        self._set_busy(False)
+
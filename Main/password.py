@@ -8,19 +8,29 @@ if str(BASE) not in sys.path:
     sys.path.insert(0, str(BASE))
 
 from PyQt6.QtWidgets import (
-    QWidget, QLabel, QLineEdit, QToolButton, QPushButton,
-    QVBoxLayout, QHBoxLayout, QScrollArea, QApplication, QFrame, QStackedWidget, QGraphicsDropShadowEffect,
+    QWidget, QLabel, QLineEdit, QPushButton,
+    QHBoxLayout, QListView, QAbstractItemView, QApplication, QFrame,
     QMessageBox, QDialog, QFormLayout
 )
-from PyQt6.QtCore import Qt, QSize
-from PyQt6.QtGui import QIcon, QColor
+from PyQt6.QtCore import Qt, QTimer, pyqtSignal
 
 # Importa del almacenamiento cifrado
-# Nota: _load_all_passwords es "interno", pero lo usamos para listar en el visor.
-from Logic.storage import _load_all_passwords, delete_password, save_password
+# La lista solo trae metadatos; cada contraseña se descifra bajo demanda con reveal_password.
+from Logic.storage import (
+    iter_passwords, reveal_password, delete_password, save_password, update_password,
+    add_change_listener,
+)
+from Logic.search_index import SearchIndex, normalize
+from Main.password_list import PasswordListModel, PasswordCardDelegate
+from Main.workers import run_in_background, run_stream_in_background
+import config
 
 
 class View_Password(QWidget):
+    # Cambio en la bóveda (evento, user_id, registro); puede llegar desde otro hilo
+    store_changed = pyqtSignal(str, int, dict)
+    # Progreso de la carga en segundo plano (registros cargados, terminado)
+    load_progress = pyqtSignal(int, bool)
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -28,6 +38,7 @@ class View_Password(QWidget):
         
         # Inicializar user_id
         self.user_id = None
+        self._loaded_for = None  # user_id de los datos cargados
 
         # ----- Cabecera -----
         self.titulo_saved = QLabel("Saved passwords", self)
@@ -40,6 +51,13 @@ class View_Password(QWidget):
             background: transparent;
         """)
 
+        # Estado de la carga
+        self.lbl_loading = QLabel("", self)
+        self.lbl_loading.setGeometry(500, 40, 290, 30)
+        self.lbl_loading.setAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+        self.lbl_loading.setStyleSheet("font-family: Helvetica; font-size: 13px; color: #6B7280; background: transparent;")
+        self.load_progress.connect(self._show_progress)
+
         self.input_pass = QLineEdit(self)
         self.input_pass.setPlaceholderText("search...")
         self.input_pass.setGeometry(90, 90, 700, 60)
@@ -70,14 +88,21 @@ class View_Password(QWidget):
         """)
         self.btn_add.clicked.connect(self._open_add_dialog)
 
-        # ----- Scroll + contenedor -----
-        self.scroll = QScrollArea(self)
-        self.scroll.setWidgetResizable(True)
-        self.scroll.setGeometry(90, 170, 700, 300)
-        self.scroll.setFrameShape(QFrame.Shape.NoFrame)
-        self.scroll.setStyleSheet("""
-        background: transparent;
-        QScrollArea { background: transparent; }
+        # ----- Lista virtualizada (modelo + delegado) -----
+        self.model = PasswordListModel(self)
+        self.delegate = PasswordCardDelegate(self)
+        self.list_view = QListView(self)
+        self.list_view.setGeometry(90, 170, 700, 300)
+        self.list_view.setModel(self.model)
+        self.list_view.setItemDelegate(self.delegate)
+        self.list_view.setUniformItemSizes(True)
+        self.list_view.setMouseTracking(True)
+        self.list_view.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        self.list_view.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.list_view.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.list_view.setFrameShape(QFrame.Shape.NoFrame)
+        self.list_view.setStyleSheet("""
+        QListView { background: transparent; border: none; outline: 0; }
         QScrollBar:vertical {
             background: transparent;
             width: 8px;
@@ -85,7 +110,7 @@ class View_Password(QWidget):
             border-radius: 4px;
         }
         QScrollBar::handle:vertical {
-            background: #FEFEFE;
+            background: #D4D2D2;
             min-height: 30px;
             border-radius: 4px;
         }
@@ -97,433 +122,367 @@ class View_Password(QWidget):
         }
         """)
 
-        self.container = QWidget()
-        self.vbox = QVBoxLayout(self.container)
-        self.vbox.setContentsMargins(16, 8, 16, 8)
-        self.vbox.setSpacing(15)
-        self.scroll.setWidget(self.container)
+        # En cola: los diálogos modales no deben abrirse dentro de editorEvent
+        self.delegate.edit_requested.connect(self._edit_record, Qt.ConnectionType.QueuedConnection)
+        self.delegate.delete_requested.connect(self._delete_record, Qt.ConnectionType.QueuedConnection)
+        self.delegate.toggle_requested.connect(self._toggle_row)
+        self.delegate.copy_requested.connect(self._copy_row)
 
         # Datos en memoria
-        self._all_records = []   # [{'sitio': str, 'usuario': str, 'contraseña': str}, ...]
-        self._item_widgets = []  # lista de QFrame
-
-        # Filtro
-        self.input_pass.textChanged.connect(self._apply_filter)
+        self._all_records = []   # [{'id': int, 'sitio': str, 'usuario': str}, ...] (sin contraseñas)
+        self._index = SearchIndex()
+
+        # Carga en segundo plano
+        self._load_worker = None
+        self._load_gen = 0           # descarta lotes de cargas anteriores
+        self._pending_changes = []   # cambios recibidos mientras se carga
+        self._load_error = None      # mensaje si la última carga falló a medias
+
+        # Filtro (con espera: solo se busca cuando se deja de teclear)
+        self._filter_timer = QTimer(self)
+        self._filter_timer.setSingleShot(True)
+        self._filter_timer.setInterval(config.SEARCH_DEBOUNCE_MS)
+        self._filter_timer.timeout.connect(self._apply_filter)
+        self.input_pass.textChanged.connect(self._filter_timer.start)
+
+        # Escrituras en la bóveda: se aplica solo el delta a la lista
+        self.store_changed.connect(self._apply_change)
+        add_change_listener(self.store_changed.emit)
 
         # Cargar desde el almacén encriptado y pintar
-        self._load_from_store()
-        self._rebuild_list()
+        self.refresh()
 
     # ---------- API pública ----------
     def set_current_user(self, user_id):
-        """Establece el usuario actual y recarga los datos"""
+        """Establece el usuario actual y recarga los datos si cambió"""
         self.user_id = user_id
-        self.refresh()
+        if self._loaded_for != user_id:
+            self.refresh()
     
     def refresh(self):
-        """Recarga desde la base de datos y reconstruye la lista al instante."""
+        """Recarga desde la base de datos en segundo plano; la primera página se pinta en cuanto llega."""
         self._load_from_store()
-        current_query = self.input_pass.text()
-        self._rebuild_list(current_query)
 
     def showEvent(self, event):
         super().showEvent(event)
-        # Al mostrar la vista, garantizamos que se ve lo último
-        try:
-            self.refresh()
-        except Exception:
-            pass
+        # Los cambios llegan como eventos; solo se recarga si cambió el usuario
+        if self._loaded_for != self.user_id:
+            try:
+                self.refresh()
+            except Exception:
+                pass
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        # Al salir de la vista, ninguna contraseña descifrada queda en memoria
+        self.model.conceal_all()
 
     # ================== Carga de datos ==================
     def _load_from_store(self):
         """
-        Lee el archivo encriptado y trae todos los registros.
-        Estructura esperada: [{'sitio':..., 'usuario':..., 'contraseña':...}, ...]
+        Lanza la lectura de los metadatos (sin descifrar) en un worker.
+        Los lotes llegan por _on_load_batch: [{'id':..., 'sitio':..., 'usuario':...}, ...]
         """
-        try:
-            if self.user_id:
-                self._all_records = _load_all_passwords(self.user_id)
-            else:
-                self._all_records = []
-            if not isinstance(self._all_records, list):
-                self._all_records = []
-        except Exception:
-            # Si hay cualquier problema de lectura/descifrado
-            self._all_records = []
-
-    # ================== Filtrado y render ==================
-    def _apply_filter(self, text: str):
-        self._rebuild_list(text)
+        if self._load_worker is not None:
+            self._load_worker.cancel()
+            self._load_worker = None
+        self._load_gen += 1
+        self._all_records = []
+        self._index.clear()
+        self._pending_changes = []
+        self._load_error = None
+        self.model.set_records([])
+        self._loaded_for = self.user_id
+        if not self.user_id:
+            self.load_progress.emit(0, True)
+            return
 
-    def _clear_layout(self):
-        """Elimina TODOS los widgets/espaciadores del layout para evitar acumulación de stretches."""
-        while self.vbox.count():
-            item = self.vbox.takeAt(0)
-            w = item.widget()
-            if w is not None:
-                w.deleteLater()
+        gen = self._load_gen
+        self.load_progress.emit(0, False)
+        self._load_worker = run_stream_in_background(
+            iter_passwords, self.user_id,
+            batch_size=config.LIST_BATCH_SIZE, first_batch=config.LIST_FIRST_BATCH,
+            on_batch=lambda batch: self._on_load_batch(gen, batch),
+            on_error=lambda message: self._on_load_error(gen, message),
+            on_finished=lambda: self._on_load_finished(gen),
+        )
+
+    def _on_load_batch(self, gen: int, batch: list):
+        if gen != self._load_gen:
+            return
+        self._all_records.extend(batch)
+        self._index.extend(batch)
+        query = self.input_pass.text().strip().lower()
+        if query:
+            batch = [rec for rec in batch if self._matches_filter(rec, query)]
+        self.model.append_records(batch)
+        self.load_progress.emit(len(self._all_records), False)
+
+    def _on_load_error(self, gen: int, message: str):
+        if gen != self._load_gen:
+            return
+        # 'finished' llega después: allí se avisa de que la lista está incompleta
+        self._load_error = message
 
-    def _rebuild_list(self, text: str | None = None):
-        # Evitar parpadeo al reconstruir
-        self.setUpdatesEnabled(False)
+    def _on_load_finished(self, gen: int):
+        if gen != self._load_gen:
+            return
+        self._load_worker = None
+        # Aplicar lo que se escribió mientras se cargaba (sin duplicar lo ya leído)
+        pending, self._pending_changes = self._pending_changes, []
+        if any(event == "reset" for event, _user_id, _rec in pending):
+            # Una sola recarga cubre todos los cambios pendientes
+            self.refresh()
+            return
+        for event, user_id, rec in pending:
+            if event == "inserted" and self._index.get(rec.get("id")) is not None:
+                continue
+            self._apply_change(event, user_id, rec)
+        if self._load_error is not None:
+            # No dar por completa una lista parcial
+            self.lbl_loading.setText(f"Incomplete list: {len(self._all_records)} loaded")
+            QMessageBox.warning(self, "Error", f"No se pudieron cargar todas las contraseñas: {self._load_error}")
+            return
+        self.load_progress.emit(len(self._all_records), True)
 
-        # limpiar cards previas + stretches anteriores
-        self._clear_layout()
-        self._item_widgets.clear()
+    def _show_progress(self, loaded: int, done: bool):
+        self.lbl_loading.setText("" if done else f"Loading... {loaded}")
 
-        query = (text or self.input_pass.text() or "").strip().lower()
-        for rec in self._all_records:
+    def _apply_change(self, event: str, user_id: int, rec: dict):
+        """Aplica a la lista un único cambio publicado por Logic.storage"""
+        if user_id != self.user_id or self._loaded_for != self.user_id:
+            return
+        if self._load_worker is not None:
+            self._pending_changes.append((event, user_id, rec))
+            return
+        if event == "reset":
+            # Cambio masivo (p. ej. importación): recargar
+            self.refresh()
+            return
+        rec_id = rec.get("id")
+        query = self.input_pass.text().strip().lower()
+        if event == "inserted":
+            # Orden id DESC: los nuevos van arriba
+            self._all_records.insert(0, rec)
+            self._index.add(rec)
             if self._matches_filter(rec, query):
-                self._insert_item_widget(rec)
+                self.model.insert_record(0, rec)
+        elif event == "updated":
+            current = self._index.get(rec_id)
+            if current is None:
+                return
+            current.update(rec)
+            self._index.add(current)
+            if not self._matches_filter(current, query):
+                self.model.remove_record(rec_id)
+            elif self.model.row_of(rec_id) >= 0:
+                self.model.record_changed(rec_id)
+            else:
+                self._rebuild_list()
+        elif event == "deleted":
+            self._all_records = [r for r in self._all_records if r.get("id") != rec_id]
+            self._index.remove(rec_id)
+            self.model.remove_record(rec_id)
 
-        # estirador final para empujar al inicio
-        self.vbox.addStretch(1)
+    # ================== Filtrado y render ==================
+    def _apply_filter(self):
+        self._rebuild_list(self.input_pass.text())
 
-        self.setUpdatesEnabled(True)
+    def _rebuild_list(self, text: str | None = None):
+        """Pasa al modelo los registros que cumplen el filtro; la vista solo pinta las filas visibles."""
+        self._filter_timer.stop()
+        query = (text or self.input_pass.text() or "").strip().lower()
+        if query:
+            self.model.set_records(self._index.search(query))
+        else:
+            self.model.set_records(self._all_records)
 
     def _matches_filter(self, rec: dict, query: str) -> bool:
         if not query:
             return True
-        hay = f"{rec.get('sitio','')} {rec.get('usuario','')}".lower()
-        return query in hay
-
-    def _insert_item_widget(self, rec: dict) -> QWidget:
-        card = self._build_card(rec)
-        # Inserta antes del stretch final
-        self.vbox.insertWidget(max(self.vbox.count() - 1, 0), card)
-        self._item_widgets.append(card)
-        return card
-
-    # ================== UI de cada card ==================
-    def _build_card(self, rec: dict) -> QWidget:
-        """
-        Card con:
-          [ Sitio + Usuario ] [ ************ ] [👁] [📋]
-        """
+        return query in normalize(rec)
+
+    # ================== Acciones de cada fila ==================
+    def _warn_no_session(self) -> bool:
+        """Muestra un aviso si no hay usuario en sesión; devuelve True si lo hay."""
+        if self.user_id:
+            return True
+        msg = QMessageBox(self)
+        msg.setWindowTitle("Error")
+        msg.setText("No hay usuario en sesión.")
+        msg.setIcon(QMessageBox.Icon.Warning)
+        msg.setStyleSheet(" Color: black; ")
+        msg.setStandardButtons(QMessageBox.StandardButton.Ok)
+        msg.exec()
+        return False
+
+    def _row_record(self, row: int) -> dict | None:
+        """Devuelve el registro de la fila o avisa si no tiene identificador."""
+        rec = self.model.record(row)
+        if rec is None or rec.get("id") is None:
+            msg = QMessageBox(self)
+            msg.setWindowTitle("Error")
+            msg.setText("No se encontró el identificador del registro.")
+            msg.setStyleSheet(" Color: black; ")
+            msg.setIcon(QMessageBox.Icon.Warning)
+            msg.setStandardButtons(QMessageBox.StandardButton.Ok)
+            msg.exec()
+            return None
+        return rec
+
+    def _reveal_row(self, row: int) -> str | None:
+        """Descifra la contraseña de una fila bajo demanda."""
+        rec = self.model.record(row)
+        if rec is None or not self.user_id:
+            return None
+        secret = reveal_password(rec.get("id"), self.user_id)
+        if secret is None:
+            QMessageBox.warning(self, "Error", "No se pudo descifrar la contraseña")
+        return secret
+
+    def _toggle_row(self, row: int):
+        if self.model.is_revealed(row):
+            self.model.conceal(row)
+            return
+        secret = self._reveal_row(row)
+        if secret is not None:
+            self.model.reveal(row, secret)
+
+    def _copy_row(self, row: int):
+        secret = self._reveal_row(row)
+        if secret is not None:
+            QApplication.clipboard().setText(secret)
+
+    def _edit_record(self, rec_id):
+        if not self._warn_no_session():
+            return
+        row = self.model.row_of(rec_id)
+        rec = self._row_record(row)
+        if rec is None:
+            return
+        rec_id = rec["id"]
         sitio = rec.get("sitio", "")
         usuario = rec.get("usuario", "")
-        password = rec.get("contraseña", "")
-
-        card = QFrame(self)
-        card.setFrameShape(QFrame.Shape.NoFrame)
-        card.setStyleSheet("""
-            QFrame {
-                background: #FFFFFF;
-                border: 1px solid #E5E7EB;
-                border-radius: 10px;
-                           
-            }
-        """)
-        shadow = QGraphicsDropShadowEffect()
-        shadow.setBlurRadius(25)
-        shadow.setXOffset(4)
-        shadow.setYOffset(6)
-        shadow.setColor(QColor(0, 0, 0, 55))
-        card.setGraphicsEffect(shadow)
-
-        lay = QHBoxLayout(card)
-        lay.setContentsMargins(16, 12, 12, 12)
-        lay.setSpacing(6)
-
-        rec_id = rec.get("id")  # requiere que storage devuelva 'id'
+        password = self._reveal_row(row)
+        if password is None:
+            return
+
+        # Abrir diálogo de edición
+        dlg = EditPasswordDialog(self, sitio, usuario, password)
+        dlg.setWindowTitle("Edit Password")
+        dlg.setStyleSheet("background: #FEFEFE; Color: black;")
+        if dlg.exec() == QDialog.DialogCode.Accepted:
+            new_sitio, new_usuario, new_clave = dlg.get_data()
+            if new_sitio and new_usuario and new_clave:
+                # La escritura (cifrado + commit) se hace fuera del hilo de la interfaz;
+                # la fila se actualiza con el evento "updated" de Logic.storage
+                run_in_background(
+                    update_password, rec_id, self.user_id, new_sitio, new_usuario, new_clave,
+                    on_result=lambda ok, site=new_sitio: self._on_updated(ok, site),
+                    on_error=lambda err: self._show_write_error("Error al actualizar", err),
+                )
+
+    def _on_updated(self, ok: bool, sitio: str):
+        if not ok:
+            self._show_write_error("Error al actualizar", "No se pudo actualizar el registro.")
+            return
+        # Mostrar mensaje de éxito
+        success_msg = QMessageBox(self)
+        success_msg.setWindowTitle("Éxito")
+        success_msg.setText(f"Contraseña de '{sitio}' actualizada correctamente.")
+        success_msg.setStyleSheet(" Color: black; ")
+        success_msg.setIcon(QMessageBox.Icon.Information)
+        success_msg.setStandardButtons(QMessageBox.StandardButton.Ok)
+        success_msg.exec()
+
+    def _show_write_error(self, title: str, error: str):
+        error_msg = QMessageBox(self)
+        error_msg.setWindowTitle("Error")
+        error_msg.setText(f"{title}: {error}")
+        error_msg.setIcon(QMessageBox.Icon.Critical)
+        error_msg.setStandardButtons(QMessageBox.StandardButton.Ok)
+        error_msg.exec()
+
+    def _delete_record(self, rec_id):
+        if not self._warn_no_session():
+            return
+        rec = self._row_record(self.model.row_of(rec_id))
+        if rec is None:
+            return
+        rec_id = rec["id"]
+        sitio = rec.get("sitio", "")
+        usuario = rec.get("usuario", "")
+
+        # Crear diálogo de confirmación personalizado
+        msg = QMessageBox(self)
+        msg.setWindowTitle("Confirmar eliminación")
+        msg.setText(f"¿Estás seguro de que quieres eliminar la contraseña de '{sitio}' para el usuario '{usuario}'?")
+        msg.setStyleSheet(" Color: black; ")
+        msg.setInformativeText("Esta acción no se puede deshacer.")
+        msg.setIcon(QMessageBox.Icon.Question)
+        msg.setStandardButtons(QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
+        msg.setDefaultButton(QMessageBox.StandardButton.No)
         
-        # Botón Editar
-        btn_edit = QToolButton(card)
-        btn_edit.setText("Edit")
-        btn_edit.setToolTip("Editar esta contraseña")
-        btn_edit.setStyleSheet("""
-            QToolButton {
-                background: #3B82F6;
+        # Personalizar los botones
+        yes_button = msg.button(QMessageBox.StandardButton.Yes)
+        yes_button.setText("Sí, eliminar")
+        yes_button.setStyleSheet("""
+            QPushButton {
+                background: #EF4444;
                 color: white;
                 font-family: Helvetica;
-                font-size: 12px;
+                font-size: 14px;
                 border: none;
                 border-radius: 6px;
-                padding: 4px 8px;
+                padding: 8px 16px;
+                min-width: 100px;
             }
-            QToolButton:hover { background: #2563EB; }
-            QToolButton:pressed { background: #1D4ED8; }
+            QPushButton:hover { background: #DC2626; }
+            QPushButton:pressed { background: #B91C1C; }
         """)
         
-        def _edit():
-            if not self.user_id:
-                msg = QMessageBox(self)
-                msg.setWindowTitle("Error")
-                msg.setText("No hay usuario en sesión.")
-                msg.setIcon(QMessageBox.Icon.Warning)
-                msg.setStyleSheet(" Color: black; ")
-                msg.setStandardButtons(QMessageBox.StandardButton.Ok)
-                msg.exec()
-                return
-                
-            if rec_id is None:
-                msg = QMessageBox(self)
-                msg.setWindowTitle("Error")
-                msg.setText("No se encontró el identificador del registro.")
-                msg.setStyleSheet(" Color: black; ")
-                msg.setIcon(QMessageBox.Icon.Warning)
-                msg.setStandardButtons(QMessageBox.StandardButton.Ok)
-                msg.exec()
-                return
-            
-            # Abrir diálogo de edición
-            dlg = EditPasswordDialog(self, sitio, usuario, password)
-            dlg.setWindowTitle("Edit Password")
-            dlg.setStyleSheet("background: #FEFEFE; Color: black;")
-            if dlg.exec() == QDialog.DialogCode.Accepted:
-                new_sitio, new_usuario, new_clave = dlg.get_data()
-                if new_sitio and new_usuario and new_clave:
-                    try:
-                        # Eliminar el registro antiguo
-                        delete_password(rec_id, self.user_id)
-                        # Crear el nuevo registro
-                        save_password(new_sitio, new_usuario, new_clave, self.user_id)
-                        # Mostrar mensaje de éxito
-                        success_msg = QMessageBox(self)
-                        success_msg.setWindowTitle("Éxito")
-                        success_msg.setText(f"Contraseña de '{new_sitio}' actualizada correctamente.")
-                        success_msg.setStyleSheet(" Color: black; ")
-                        success_msg.setIcon(QMessageBox.Icon.Information)
-                        success_msg.setStandardButtons(QMessageBox.StandardButton.Ok)
-                        success_msg.exec()
-                        self.refresh()
-                    except Exception as e:
-                        error_msg = QMessageBox(self)
-                        error_msg.setWindowTitle("Error")
-                        error_msg.setText(f"Error al actualizar: {str(e)}")
-                        error_msg.setIcon(QMessageBox.Icon.Critical)
-                        error_msg.setStandardButtons(QMessageBox.StandardButton.Ok)
-                        error_msg.exec()
-        
-        btn_edit.clicked.connect(_edit)
-        lay.addWidget(btn_edit)
-        
-        # Botón Eliminar
-        btn_del = QToolButton(card)
-        btn_del.setText("Delete")
-        btn_del.setToolTip("Eliminar esta contraseña")
-        btn_del.setStyleSheet("""
-            QToolButton {
-                background: #EF4444;
+        no_button = msg.button(QMessageBox.StandardButton.No)
+        no_button.setText("Cancelar")
+        no_button.setStyleSheet("""
+            QPushButton {
+                background: #6B7280;
                 color: white;
                 font-family: Helvetica;
-                font-size: 12px;
+                font-size: 14px;
                 border: none;
                 border-radius: 6px;
-                padding: 4px 8px;
+                padding: 8px 16px;
+                min-width: 100px;
             }
-            QToolButton:hover { background: #DC2626; }
-            QToolButton:pressed { background: #B91C1C; }
+            QPushButton:hover { background: #4B5563; }
+            QPushButton:pressed { background: #374151; }
         """)
-        def _delete():
-            if not self.user_id:
-                msg = QMessageBox(self)
-                msg.setWindowTitle("Error")
-                msg.setText("No hay usuario en sesión.")
-                msg.setIcon(QMessageBox.Icon.Warning)
-                msg.setStyleSheet(" Color: black; ")
-
-                msg.setStandardButtons(QMessageBox.StandardButton.Ok)
-                msg.exec()
-                return
-                
-            if rec_id is None:
-                msg = QMessageBox(self)
-                msg.setWindowTitle("Error")
-                msg.setText("No se encontró el identificador del registro.")
-                msg.setStyleSheet(" Color: black; ")
-                msg.setIcon(QMessageBox.Icon.Warning)
-                msg.setStandardButtons(QMessageBox.StandardButton.Ok)
-                msg.exec()
-                return
-            
-            # Crear diálogo de confirmación personalizado
-            msg = QMessageBox(self)
-            msg.setWindowTitle("Confirmar eliminación")
-            msg.setText(f"¿Estás seguro de que quieres eliminar la contraseña de '{sitio}' para el usuario '{usuario}'?")
-            msg.setStyleSheet(" Color: black; ")
-            msg.setInformativeText("Esta acción no se puede deshacer.")
-            msg.setIcon(QMessageBox.Icon.Question)
-            msg.setStandardButtons(QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
-            msg.setDefaultButton(QMessageBox.StandardButton.No)
-            
-            # Personalizar los botones
-            yes_button = msg.button(QMessageBox.StandardButton.Yes)
-            yes_button.setText("Sí, eliminar")
-            yes_button.setStyleSheet("""
-                QPushButton {
-                    background: #EF4444;
-                    color: white;
-                    font-family: Helvetica;
-                    font-size: 14px;
-                    border: none;
-                    border-radius: 6px;
-                    padding: 8px 16px;
-                    min-width: 100px;
-                }
-                QPushButton:hover { background: #DC2626; }
-                QPushButton:pressed { background: #B91C1C; }
-            """)
-            
-            no_button = msg.button(QMessageBox.StandardButton.No)
-            no_button.setText("Cancelar")
-            no_button.setStyleSheet("""
-                QPushButton {
-                    background: #6B7280;
-                    color: white;
-                    font-family: Helvetica;
-                    font-size: 14px;
-                    border: none;
-                    border-radius: 6px;
-                    padding: 8px 16px;
-                    min-width: 100px;
-                }
-                QPushButton:hover { background: #4B5563; }
-                QPushButton:pressed { background: #374151; }
-            """)
-            
-            resp = msg.exec()
-            if resp == QMessageBox.StandardButton.Yes:
-                try:
-                    ok = delete_password(rec_id, self.user_id)
-                    if ok:
-                        # Mostrar mensaje de éxito
-                        success_msg = QMessageBox(self)
-                        success_msg.setWindowTitle("Éxito")
-                        success_msg.setText(f"Contraseña de '{sitio}' eliminada correctamente.")
-                        success_msg.setStyleSheet(" Color: black; ")
-                        success_msg.setIcon(QMessageBox.Icon.Information)
-                        success_msg.setStandardButtons(QMessageBox.StandardButton.Ok)
-                        success_msg.exec()
-                        self.refresh()
-                    else:
-                        error_msg = QMessageBox(self)
-                        error_msg.setWindowTitle("Error")
-                        error_msg.setText("No se pudo eliminar el registro.")
-                        error_msg.setIcon(QMessageBox.Icon.Warning)
-                        error_msg.setStandardButtons(QMessageBox.StandardButton.Ok)
-                        error_msg.exec()
-                except Exception as e:
-                    error_msg = QMessageBox(self)
-                    error_msg.setWindowTitle("Error")
-                    error_msg.setText(f"Error al eliminar: {str(e)}")
-                    error_msg.setIcon(QMessageBox.Icon.Critical)
-                    error_msg.setStandardButtons(QMessageBox.StandardButton.Ok)
-                    error_msg.exec()
         
-        btn_del.clicked.connect(_delete)
-        lay.addWidget(btn_del)
-
-        # Columna izquierda: sitio + usuario
-        left = QVBoxLayout()
-        lbl_site = QLabel(sitio, card)
-        lbl_site.setStyleSheet("font-size: 16px; color: #111827; font-weight: 600; border: none; font-weight: bold;")
-        lbl_user = QLabel(usuario, card)
-        lbl_user.setStyleSheet("font-size: 16px; color: #000000; border: none;")
-        left.addWidget(lbl_site)
-        left.addWidget(lbl_user)
-        lay.addLayout(left, 21)
-
-        # Campo contraseña (oculta, solo lectura)
-        pwd = QLineEdit(card)
-        pwd.setText(password)
-        pwd.setReadOnly(True)
-        pwd.setEchoMode(QLineEdit.EchoMode.Password)
-        pwd.setFixedWidth(200)  # Ancho fijo consistente
-        pwd.setMinimumWidth(120)
-        pwd.setStyleSheet("""
-            QLineEdit {
-                font-size: 20px;
-                background: #FFFFFF;
-                border: none;
-                border-radius: 10px;
-                padding: 6px 10px;
-                font-family: "Courier New", monospace;
-                color: black;
-                font-weight: bold;
-            }
-        """)
-        lay.addWidget(pwd)
-        lay.addStretch(1)
-
-        # Botón ver/ocultar
-        btn_eye = QToolButton(card)
-        btn_eye.setCursor(Qt.CursorShape.PointingHandCursor)
-        btn_eye.setIcon(QIcon("Main/assets/eye-closed.png"))  # inicia oculto
-        btn_eye.setIconSize(QSize(28, 28))
-        btn_eye.setFixedSize(44, 40)
-        btn_eye.setToolTip("Ver contraseña")
-        btn_eye.setStyleSheet("""
-            QToolButton {
-                background: #FFFFFF;
-                border: none;
-                border-radius: 10px;
-                padding: 6px;
-            }
-            QToolButton:hover { background: #F3F4F6; }
-            QToolButton:pressed { background: #E5E7EB; }
-        """)
-
-        def _toggle():
-            if pwd.echoMode() == QLineEdit.EchoMode.Password:
-                pwd.setEchoMode(QLineEdit.EchoMode.Normal)
-                btn_eye.setIcon(QIcon("Main/assets/eye-open.png"))
-                pwd.setStyleSheet("""
-                    QLineEdit {
-                        font-size: 20px;
-                        background: #F3F4F6;
-                        border: none;
-                        border-radius: 10px;
-                        padding: 6px 10px;
-                        font-family: "Courier New", monospace;
-                        color: black;
-                        font-weight: bold;
-                    }""")
-                btn_eye.setToolTip("Ocultar contraseña")
-            else:
-                pwd.setEchoMode(QLineEdit.EchoMode.Password)
-                btn_eye.setIcon(QIcon("Main/assets/eye-closed.png"))
-                btn_eye.setToolTip("Ver contraseña")
-                pwd.setStyleSheet("""
-                    QLineEdit {
-                        font-size: 20px;
-                        background: #FFFFFF;
-                        border: none;
-                        border-radius: 10px;
-                        padding: 6px 10px;
-                        font-family: "Courier New", monospace;
-                        color: black;
-                        font-weight: bold;
-                    }
-                """)
-        btn_eye.clicked.connect(_toggle)
-        lay.addWidget(btn_eye)
-
-        # Botón copiar
-        btn_copy = QToolButton(card)
-        btn_copy.setCursor(Qt.CursorShape.PointingHandCursor)
-        btn_copy.setIcon(QIcon("Main/assets/copy-savepass.png"))
-        btn_copy.setIconSize(QSize(22, 22))
-        btn_copy.setFixedSize(44, 40)
-        btn_copy.setToolTip("Copiar al portapapeles")
-        btn_copy.setStyleSheet("""
-            QToolButton {
-                background: #FFFFFF;
-                border: none;
-                border-radius: 10px;
-                padding: 6px;
-            }
-            QToolButton:hover { background: #F3F4F6; }
-            QToolButton:pressed { background: #E5E7EB; }
-        """)
-
-        def _copy():
-            pwd.selectAll()
-            pwd.copy()
-        btn_copy.clicked.connect(_copy)
-        lay.addWidget(btn_copy)
-
-        return card
+        resp = msg.exec()
+        if resp == QMessageBox.StandardButton.Yes:
+            run_in_background(
+                delete_password, rec_id, self.user_id,
+                on_result=lambda ok, site=sitio: self._on_deleted(ok, site),
+                on_error=lambda err: self._show_write_error("Error al eliminar", err),
+            )
+
+    def _on_deleted(self, ok: bool, sitio: str):
+        if ok:
+            # Mostrar mensaje de éxito
+            success_msg = QMessageBox(self)
+            success_msg.setWindowTitle("Éxito")
+            success_msg.setText(f"Contraseña de '{sitio}' eliminada correctamente.")
+            success_msg.setStyleSheet(" Color: black; ")
+            success_msg.setIcon(QMessageBox.Icon.Information)
+            success_msg.setStandardButtons(QMessageBox.StandardButton.Ok)
+            success_msg.exec()
+        else:
+            error_msg = QMessageBox(self)
+            error_msg.setWindowTitle("Error")
+            error_msg.setText("No se pudo eliminar el registro.")
+            error_msg.setIcon(QMessageBox.Icon.Warning)
+            error_msg.setStandardButtons(QMessageBox.StandardButton.Ok)
+            error_msg.exec()
 
     def _open_add_dialog(self):
         if not self.user_id:
@@ -542,11 +501,15 @@ class View_Password(QWidget):
         if dlg.exec() == QDialog.DialogCode.Accepted:
             sitio, usuario, clave = dlg.get_data()
             if sitio and usuario and clave:
-                try:
-                    save_password(sitio, usuario, clave, self.user_id)
-                    self.refresh()
-                except Exception:
-                    QMessageBox.warning(self, "Error", "No se pudo guardar la contraseña")
+                run_in_background(
+                    save_password, sitio, usuario, clave, self.user_id,
+                    on_result=self._on_saved,
+                    on_error=lambda _err: self._on_saved(False),
+                )
+
+    def _on_saved(self, ok: bool):
+        if not ok:
+            QMessageBox.warning(self, "Error", "No se pudo guardar la contraseña")
 
 
 class AddPasswordDialog(QDialog):
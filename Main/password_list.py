@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+"""Modelo y delegado de la lista de contraseñas (solo se pintan las filas visibles)"""
+from PyQt6.QtWidgets import QStyledItemDelegate, QStyle, QToolTip
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex, QRect, QRectF, QSize, QEvent, pyqtSignal
+from PyQt6.QtGui import QIcon, QColor, QFont, QPainter, QPainterPath, QPen
+
+import config
+
+
+class PasswordListModel(QAbstractListModel):
+    """
+    Modelo plano sobre los registros del usuario.
+    Cada registro es un dict {'id', 'sitio', 'usuario'}; la contraseña solo se
+    guarda (descifrada) mientras la fila está en modo "ver".
+    """
+    IdRole = Qt.ItemDataRole.UserRole + 1
+    SiteRole = Qt.ItemDataRole.UserRole + 2
+    UserNameRole = Qt.ItemDataRole.UserRole + 3
+    PasswordRole = Qt.ItemDataRole.UserRole + 4
+    RevealedRole = Qt.ItemDataRole.UserRole + 5
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._records = []
+        self._secrets = {}  # id -> contraseña descifrada de las filas visibles
+
+    # ---------- API de Qt ----------
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._records)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or not (0 <= index.row() < len(self._records)):
+            return None
+        rec = self._records[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return f"{rec.get('sitio', '')} {rec.get('usuario', '')}"
+        if role == self.IdRole:
+            return rec.get("id")
+        if role == self.SiteRole:
+            return rec.get("sitio", "")
+        if role == self.UserNameRole:
+            return rec.get("usuario", "")
+        if role == self.PasswordRole:
+            return self._secrets.get(rec.get("id"), "")
+        if role == self.RevealedRole:
+            return rec.get("id") in self._secrets
+        return None
+
+    # ---------- API pública ----------
+    def set_records(self, records):
+        """Sustituye todos los registros mostrados"""
+        self.beginResetModel()
+        self._records = list(records)
+        ids = {rec.get("id") for rec in self._records}
+        self._secrets = {k: v for k, v in self._secrets.items() if k in ids}
+        self.endResetModel()
+
+    def record(self, row: int) -> dict | None:
+        if 0 <= row < len(self._records):
+            return self._records[row]
+        return None
+
+    def row_of(self, rec_id) -> int:
+        """Fila del registro con ese id, o -1"""
+        for row, rec in enumerate(self._records):
+            if rec.get("id") == rec_id:
+                return row
+        return -1
+
+    def insert_record(self, row: int, rec: dict) -> None:
+        """Inserta una fila sin reiniciar el modelo"""
+        row = max(0, min(row, len(self._records)))
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._records.insert(row, rec)
+        self.endInsertRows()
+
+    def append_records(self, records) -> None:
+        """Añade un lote de filas al final (carga progresiva)"""
+        if not records:
+            return
+        first = len(self._records)
+        self.beginInsertRows(QModelIndex(), first, first + len(records) - 1)
+        self._records.extend(records)
+        self.endInsertRows()
+
+    def remove_record(self, rec_id) -> None:
+        """Quita la fila de ese id (si está) sin reiniciar el modelo"""
+        row = self.row_of(rec_id)
+        if row < 0:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._records[row]
+        self._secrets.pop(rec_id, None)
+        self.endRemoveRows()
+
+    def record_changed(self, rec_id) -> None:
+        """Repinta la fila de ese id y descarta su contraseña descifrada (puede haber cambiado)"""
+        row = self.row_of(rec_id)
+        if row < 0:
+            return
+        self._secrets.pop(rec_id, None)
+        idx = self.index(row)
+        self.dataChanged.emit(idx, idx)
+
+    def is_revealed(self, row: int) -> bool:
+        rec = self.record(row)
+        return rec is not None and rec.get("id") in self._secrets
+
+    def reveal(self, row: int, secret: str) -> None:
+        """Muestra la contraseña (ya descifrada) de una fila"""
+        rec = self.record(row)
+        if rec is None:
+            return
+        self._secrets[rec.get("id")] = secret
+        self._row_changed(row)
+
+    def conceal(self, row: int) -> None:
+        """Oculta la contraseña de una fila y la descarta de memoria"""
+        rec = self.record(row)
+        if rec is None:
+            return
+        self._secrets.pop(rec.get("id"), None)
+        self._row_changed(row)
+
+    def conceal_all(self) -> None:
+        self._secrets.clear()
+        if self._records:
+            self.dataChanged.emit(self.index(0), self.index(len(self._records) - 1),
+                                  [self.PasswordRole, self.RevealedRole])
+
+    def _row_changed(self, row: int) -> None:
+        idx = self.index(row)
+        self.dataChanged.emit(idx, idx, [self.PasswordRole, self.RevealedRole])
+
+
+class PasswordCardDelegate(QStyledItemDelegate):
+    """
+    Pinta cada fila como una card:
+      [Edit] [Delete] [ Sitio + Usuario ] [ ************ ] [👁] [📋]
+    Los botones son zonas pintadas; los clics se traducen a señales.
+    """
+    # Editar/borrar llevan el id del registro (no la fila): se atienden en diferido
+    # y entretanto la lista puede haber cambiado
+    edit_requested = pyqtSignal(object)
+    delete_requested = pyqtSignal(object)
+    toggle_requested = pyqtSignal(int)
+    copy_requested = pyqtSignal(int)
+
+    ROW_HEIGHT = 78
+    MASK = "•" * 12
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._icon_eye_closed = QIcon(config.ASSETS_PATH + "eye-closed.png")
+        self._icon_eye_open = QIcon(config.ASSETS_PATH + "eye-open.png")
+        self._icon_copy = QIcon(config.ASSETS_PATH + "copy-savepass.png")
+
+        self._font_button = QFont("Helvetica", 9)
+        self._font_site = QFont("Helvetica", 12)
+        self._font_site.setBold(True)
+        self._font_user = QFont("Helvetica", 12)
+        self._font_pwd = QFont("Courier New", 15)
+        self._font_pwd.setBold(True)
+
+    def sizeHint(self, option, index):
+        return QSize(option.rect.width(), self.ROW_HEIGHT)
+
+    def _layout(self, rect: QRect) -> dict:
+        """Calcula las zonas de la card dentro de la fila"""
+        card = rect.adjusted(16, 6, -16, -8)
+        cy = card.center().y()
+        x = card.left() + 16
+        edit = QRect(x, cy - 13, 44, 26)
+        x = edit.right() + 7
+        delete = QRect(x, cy - 13, 56, 26)
+        copy = QRect(card.right() - 12 - 44, cy - 20, 44, 40)
+        eye = QRect(copy.left() - 6 - 44, cy - 20, 44, 40)
+        pwd = QRect(eye.left() - 12 - 200, cy - 18, 200, 36)
+        text = QRect(delete.right() + 12, card.top() + 8, max(pwd.left() - delete.right() - 18, 0), card.height() - 16)
+        return {"card": card, "edit": edit, "delete": delete, "text": text, "pwd": pwd, "eye": eye, "copy": copy}
+
+    def paint(self, painter: QPainter, option, index):
+        painter.save()
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        zones = self._layout(option.rect)
+        card = QRectF(zones["card"])
+
+        # Sombra + fondo de la card
+        shadow = QPainterPath()
+        shadow.addRoundedRect(card.translated(2, 3), 10, 10)
+        painter.fillPath(shadow, QColor(0, 0, 0, 22))
+        path = QPainterPath()
+        path.addRoundedRect(card, 10, 10)
+        painter.fillPath(path, QColor("#FFFFFF"))
+        border = QColor("#3B82F6") if option.state & QStyle.StateFlag.State_MouseOver else QColor("#E5E7EB")
+        painter.setPen(QPen(border, 1))
+        painter.drawPath(path)
+
+        # Botones Editar / Eliminar
+        self._paint_button(painter, zones["edit"], "Edit", QColor("#3B82F6"))
+        self._paint_button(painter, zones["delete"], "Delete", QColor("#EF4444"))
+
+        # Sitio + usuario
+        text = zones["text"]
+        half = text.height() // 2
+        painter.setPen(QColor("#111827"))
+        painter.setFont(self._font_site)
+        site = index.data(PasswordListModel.SiteRole) or ""
+        site_rect = QRect(text.left(), text.top(), text.width(), half)
+        painter.drawText(site_rect, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter,
+                         painter.fontMetrics().elidedText(site, Qt.TextElideMode.ElideRight, text.width()))
+        painter.setPen(QColor("#000000"))
+        painter.setFont(self._font_user)
+        user = index.data(PasswordListModel.UserNameRole) or ""
+        user_rect = QRect(text.left(), text.top() + half, text.width(), text.height() - half)
+        painter.drawText(user_rect, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter,
+                         painter.fontMetrics().elidedText(user, Qt.TextElideMode.ElideRight, text.width()))
+
+        # Contraseña (oculta salvo que se haya pulsado el ojo)
+        revealed = bool(index.data(PasswordListModel.RevealedRole))
+        pwd = zones["pwd"]
+        if revealed:
+            bg = QPainterPath()
+            bg.addRoundedRect(QRectF(pwd), 10, 10)
+            painter.fillPath(bg, QColor("#F3F4F6"))
+            shown = index.data(PasswordListModel.PasswordRole) or ""
+        else:
+            shown = self.MASK
+        painter.setPen(QColor("#000000"))
+        painter.setFont(self._font_pwd)
+        painter.drawText(pwd.adjusted(10, 0, -10, 0), Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter,
+                         painter.fontMetrics().elidedText(shown, Qt.TextElideMode.ElideRight, pwd.width() - 20))
+
+        # Ver / copiar
+        eye_icon = self._icon_eye_open if revealed else self._icon_eye_closed
+        eye_icon.paint(painter, zones["eye"].adjusted(8, 6, -8, -6))
+        self._icon_copy.paint(painter, zones["copy"].adjusted(11, 9, -11, -9))
+
+        painter.restore()
+
+    def _paint_button(self, painter: QPainter, rect: QRect, text: str, color: QColor):
+        path = QPainterPath()
+        path.addRoundedRect(QRectF(rect), 6, 6)
+        painter.fillPath(path, color)
+        painter.setPen(QColor("#FFFFFF"))
+        painter.setFont(self._font_button)
+        painter.drawText(rect, Qt.AlignmentFlag.AlignCenter, text)
+
+    def editorEvent(self, event, model, option, index):
+        """Traduce los clics sobre las zonas de botón a señales"""
+        if event.type() != QEvent.Type.MouseButtonRelease or event.button() != Qt.MouseButton.LeftButton:
+            return False
+        pos = event.position().toPoint()
+        zones = self._layout(option.rect)
+        row = index.row()
+        if zones["edit"].contains(pos):
+            self.edit_requested.emit(index.data(PasswordListModel.IdRole))
+        elif zones["delete"].contains(pos):
+            self.delete_requested.emit(index.data(PasswordListModel.IdRole))
+        elif zones["eye"].contains(pos):
+            self.toggle_requested.emit(row)
+        elif zones["copy"].contains(pos):
+            self.copy_requested.emit(row)
+        else:
+            return False
+        return True
+
+    def helpEvent(self, event, view, option, index):
+        """Tooltips de los botones pintados"""
+        if event is None or index is None or not index.isValid():
+            return super().helpEvent(event, view, option, index)
+        zones = self._layout(option.rect)
+        pos = event.pos()
+        tips = (
+            ("edit", "Editar esta contraseña"),
+            ("delete", "Eliminar esta contraseña"),
+            ("eye", "Ocultar contraseña" if index.data(PasswordListModel.RevealedRole) else "Ver contraseña"),
+            ("copy", "Copiar al portapapeles"),
+        )
+        for zone, tip in tips:
+            if zones[zone].contains(pos):
+                QToolTip.showText(event.globalPos(), tip, view)
+                return True
+        return super().helpEvent(event, view, option, index)
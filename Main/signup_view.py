@@ -7,6 +7,7 @@ from PyQt6.QtWidgets import (
 )
 from Logic.login import create_user, user_exists
 from Logic.session import save_session
+from Main.workers import run_in_background
 import config
 
 class SignupView(QWidget):
@@ -15,6 +16,7 @@ class SignupView(QWidget):
 
     def __init__(self, parent=None):
         super().__init__(parent)
+        self._signup_worker = None  # creación de cuenta en curso
         self.setFixedSize(config.WINDOW_WIDTH, config.WINDOW_HEIGHT)
         self._create_ui()
         self._connect_events()
@@ -232,8 +234,18 @@ class SignupView(QWidget):
         """Validación básica de email"""
         return "@" in email and "." in email.split("@")[1]
 
+    def _set_busy(self, busy: bool):
+        """Bloquea el formulario mientras se crea la cuenta en segundo plano"""
+        self.btn_signup.setEnabled(not busy)
+        self.btn_signup.setText("Creating account..." if busy else "Sign Up")
+        for field in (self.input_name, self.input_email, self.input_pw, self.input_pw_confirm):
+            field.setReadOnly(busy)
+        self.link_login.setEnabled(not busy)
+
     def _do_signup(self):
         """Maneja el registro"""
+        if self._signup_worker is not None:
+            return
         self.msg.clear()
         
         name = self.input_name.text().strip()
@@ -266,24 +278,38 @@ class SignupView(QWidget):
             self._error("Please agree to the Terms and Conditions.")
             return
         
-        # Verificar si ya existe
-        if user_exists(email, name):
+        # Crear usuario (PBKDF2) fuera del hilo de la interfaz
+        self._set_busy(True)
+        self._info("Creating account...")
+        self._signup_worker = run_in_background(
+            _register, email, name, password,
+            on_result=self._on_signup_result,
+            on_error=lambda e: self._error(f"Error creating account: {e}"),
+            on_finished=self._on_signup_finished,
+        )
+
+    def _on_signup_result(self, user_id):
+        if user_id is None:
             self._error("Email or username already exists.")
-            return
-        
-        # Crear usuario
-        try:
-            user_id = create_user(email, name, password)
-            if user_id:
-                # Guardar sesión automáticamente
-                try:
-                    save_session(user_id, ttl_days=config.DEFAULT_TTL_DAYS)
-                except Exception:
-                    pass
-                
-                self._success("Account created successfully!")
-                self.registered.emit(user_id)
-            else:
-                self._error("Failed to create account. Please try again.")
-        except Exception as e:
-            self._error(f"Error creating account: {str(e)}")
\ No newline at end of file
+        elif user_id:
+            # Guardar sesión automáticamente
+            try:
+                save_session(user_id, ttl_days=config.DEFAULT_TTL_DAYS)
+            except Exception:
+                pass
+            
+            self._success("Account created successfully!")
+            self.registered.emit(user_id)
+        else:
+            self._error("Failed to create account. Please try again.")
+
+    def _on_signup_finished(self):
+        self._signup_worker = None
+        self._set_busy(False)
+
+
+def _register(email: str, name: str, password: str) -> int | None:
+    """Crea la cuenta (en el hilo del worker); None si ya existe, 0 si falla"""
+    if user_exists(email, name):
+        return None
+    return create_user(email, name, password)
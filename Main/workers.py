@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""Ejecución de tareas bloqueantes fuera del hilo de la interfaz"""
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+# Workers en marcha: se mantienen vivos hasta que 'finished' llega al hilo de la interfaz
+_active = set()
+
+
+class WorkerSignals(QObject):
+    """Señales de un Worker (se entregan en el hilo de la interfaz)"""
+    result = pyqtSignal(object)
+    error = pyqtSignal(str)
+    finished = pyqtSignal()
+
+
+class StreamSignals(QObject):
+    """Señales de un StreamWorker: un 'batch' por cada elemento producido"""
+    batch = pyqtSignal(object)
+    error = pyqtSignal(str)
+    finished = pyqtSignal()
+
+
+class Worker(QRunnable):
+    """Ejecuta fn(*args, **kwargs) en el QThreadPool global y emite el resultado"""
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = WorkerSignals()
+
+    def run(self):
+        try:
+            res = self.fn(*self.args, **self.kwargs)
+        except Exception as e:
+            self.signals.error.emit(str(e))
+        else:
+            self.signals.result.emit(res)
+        finally:
+            self.signals.finished.emit()
+
+
+class StreamWorker(QRunnable):
+    """Recorre el generador fn(*args, **kwargs) en el QThreadPool y emite cada elemento"""
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = StreamSignals()
+        self._cancelled = False
+
+    def cancel(self):
+        """Pide parar en el siguiente elemento"""
+        self._cancelled = True
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def run(self):
+        gen = None
+        try:
+            gen = self.fn(*self.args, **self.kwargs)
+            for item in gen:
+                if self._cancelled:
+                    break
+                self.signals.batch.emit(item)
+        except Exception as e:
+            self.signals.error.emit(str(e))
+        finally:
+            if gen is not None and hasattr(gen, "close"):
+                gen.close()
+            self.signals.finished.emit()
+
+
+def _start(worker) -> None:
+    _active.add(worker)
+    worker.signals.finished.connect(lambda: _active.discard(worker))
+    QThreadPool.globalInstance().start(worker)
+
+
+def run_in_background(fn, *args, on_result=None, on_error=None, on_finished=None, **kwargs) -> Worker:
+    """
+    Lanza fn en segundo plano y conecta los callbacks opcionales.
+    Devuelve el Worker (se mantiene vivo hasta 'finished').
+    """
+    worker = Worker(fn, *args, **kwargs)
+    if on_result is not None:
+        worker.signals.result.connect(on_result)
+    if on_error is not None:
+        worker.signals.error.connect(on_error)
+    if on_finished is not None:
+        worker.signals.finished.connect(on_finished)
+    _start(worker)
+    return worker
+
+
+def run_stream_in_background(fn, *args, on_batch=None, on_error=None, on_finished=None, **kwargs) -> StreamWorker:
+    """
+    Lanza el generador fn en segundo plano; on_batch recibe cada elemento en el hilo de la interfaz.
+    Devuelve el StreamWorker (permite cancel(); se mantiene vivo hasta 'finished').
+    """
+    worker = StreamWorker(fn, *args, **kwargs)
+    if on_batch is not None:
+        worker.signals.batch.connect(on_batch)
+    if on_error is not None:
+        worker.signals.error.connect(on_error)
+    if on_finished is not None:
+        worker.signals.finished.connect(on_finished)
+    _start(worker)
+    return worker
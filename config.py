@@ -13,15 +13,41 @@ DEBUG = os.getenv('DEBUG', 'false').lower() == 'true'
 # Base de datos SQLite local
 DB_PATH = os.getenv('DB_PATH', 'db')
 DB_FILE = os.getenv('DB_FILE', 'keypass.db')
+# Máximo de escrituras confirmadas juntas por el hilo escritor
+DB_WRITE_BATCH = int(os.getenv('DB_WRITE_BATCH', '64'))
+# Conexiones de lectura libres que se mantienen abiertas para reutilizarlas
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '4'))
 
 # JWT
 JWT_SECRET = os.getenv('JWT_SECRET')
 JWT_ALGORITHM = "HS256"
 
 # Cifrado
-ENCRYPTION_ALGORITHM = "pbkdf2_sha256"
+# Hash de las contraseñas de login: pbkdf2_sha256 | scrypt (los demás se migran al iniciar sesión)
+ENCRYPTION_ALGORITHM = os.getenv('PASSWORD_HASHER', 'pbkdf2_sha256')
 DEFAULT_ITERATIONS = int(os.getenv('DEFAULT_ITERATIONS', '200000'))
+# Iteraciones PBKDF2 calibradas en este equipo para tardar unos ms por login
+# (DEFAULT_ITERATIONS es el mínimo; 0 = sin calibrar, usar siempre DEFAULT_ITERATIONS)
+PBKDF2_TARGET_MS = int(os.getenv('PBKDF2_TARGET_MS', '250'))
 SALT_BYTES = int(os.getenv('SALT_BYTES', '16'))
+# Límite de intentos de login: ráfaga y ritmo por login y para toda la aplicación
+# (ritmo 0 = no se recupera: agotada la ráfaga no se permiten más intentos)
+LOGIN_BURST = int(os.getenv('LOGIN_BURST', '5'))
+LOGIN_ATTEMPTS_PER_MINUTE = float(os.getenv('LOGIN_ATTEMPTS_PER_MINUTE', '5'))
+LOGIN_GLOBAL_BURST = int(os.getenv('LOGIN_GLOBAL_BURST', '20'))
+LOGIN_GLOBAL_ATTEMPTS_PER_MINUTE = float(os.getenv('LOGIN_GLOBAL_ATTEMPTS_PER_MINUTE', '60'))
+LOGIN_LIMITER_SIZE = int(os.getenv('LOGIN_LIMITER_SIZE', '1024'))
+# Parámetros de scrypt (memoria ~128·N·R bytes por login: 32 MiB por defecto)
+SCRYPT_N = int(os.getenv('SCRYPT_N', '32768'))
+SCRYPT_R = int(os.getenv('SCRYPT_R', '8'))
+SCRYPT_P = int(os.getenv('SCRYPT_P', '1'))
+# Segundos de inactividad antes de olvidar la clave de la bóveda (0 = nunca)
+KEY_IDLE_TIMEOUT = int(os.getenv('KEY_IDLE_TIMEOUT', '900'))
+# Formato de los registros cifrados que se escriben (1 = AES-CBC+HMAC, 2 = AES-GCM)
+RECORD_FORMAT_VERSION = int(os.getenv('RECORD_FORMAT_VERSION', '2'))
+# Descifrado en paralelo: hilos (0 = según núcleos, 1 = desactivado) y mínimo de elementos
+DECRYPT_WORKERS = int(os.getenv('DECRYPT_WORKERS', '0'))
+PARALLEL_DECRYPT_THRESHOLD = int(os.getenv('PARALLEL_DECRYPT_THRESHOLD', '256'))
 
 # Sesión
 DEFAULT_TTL_DAYS = int(os.getenv('SESSION_TTL_DAYS', '30'))
@@ -31,11 +57,22 @@ SESSION_FILE = "session.bin"
 WINDOW_WIDTH = int(os.getenv('WINDOW_WIDTH', '900'))
 WINDOW_HEIGHT = int(os.getenv('WINDOW_HEIGHT', '600'))
 WINDOW_TITLE = os.getenv('WINDOW_TITLE', 'KeyPass - Gestor de Contraseñas')
+# Espera tras la última tecla antes de filtrar la lista (ms)
+SEARCH_DEBOUNCE_MS = int(os.getenv('SEARCH_DEBOUNCE_MS', '150'))
+# Carga de la lista por lotes: primera página pequeña, el resto en lotes mayores
+LIST_FIRST_BATCH = int(os.getenv('LIST_FIRST_BATCH', '50'))
+LIST_BATCH_SIZE = int(os.getenv('LIST_BATCH_SIZE', '500'))
 
 # Contraseñas
 MIN_PASSWORD_LENGTH = int(os.getenv('MIN_PASSWORD_LENGTH', '6'))
 MAX_PASSWORD_LENGTH = int(os.getenv('MAX_PASSWORD_LENGTH', '32'))
 DEFAULT_PASSWORD_LENGTH = int(os.getenv('DEFAULT_PASSWORD_LENGTH', '14'))
 
+# Exportación / importación por lotes
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '500'))
+
+# Rotación de la clave de cifrado (registros re-cifrados por transacción)
+REKEY_BATCH_SIZE = int(os.getenv('REKEY_BATCH_SIZE', '500'))
+
 # Archivos
 ASSETS_PATH = os.getenv('ASSETS_PATH', 'Main/assets/')
\ No newline at end of file